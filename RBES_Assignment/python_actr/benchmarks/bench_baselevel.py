@@ -0,0 +1,59 @@
+"""Measure base-level activation of many chunks with many presentations.
+
+The activations of all the chunks are found the way Memory.request() does
+it (Memory.get_activations()), one chunk at a time with
+DMBaseLevel.activation() and all at once with DMBaseLevel.activation_many().
+Then the activations are found repeatedly as time goes on, exactly and with
+DMBaseLevel keeping a cache of each chunk's older presentations.
+
+Run with:  python benchmarks/bench_baselevel.py [chunks] [presentations]
+"""
+import sys
+import time
+import random
+
+sys.path.insert(0,'.')
+
+import python_actr
+from python_actr.actr.dm import Memory,DMBaseLevel
+from python_actr.actr.buffer import Buffer
+
+def build(chunks,presentations,limit=None,error=None):
+    memory=Memory(Buffer())
+    base=DMBaseLevel(memory,limit=limit,error=error)
+    now=[0.0]
+    base.now=lambda:now[0]
+    rng=random.Random(1)
+    for i in range(chunks*presentations):
+        now[0]=i*0.01
+        memory.add('item%d'%rng.randrange(chunks))
+    now[0]+=10
+    return memory,base,now
+
+def run(memory,base,vectorized,repeats=10):
+    base.vectorized=vectorized
+    start=time.perf_counter()
+    for i in range(repeats):
+        memory.get_activations(memory.dm)
+    return (time.perf_counter()-start)/repeats
+
+def later(memory,base,now,repeats=50):
+    start=time.perf_counter()
+    for i in range(repeats):
+        now[0]+=0.05
+        for chunk in memory.dm: memory.get_activation(chunk)
+    return (time.perf_counter()-start)/repeats
+
+if __name__=='__main__':
+    chunks=int(sys.argv[1]) if len(sys.argv)>1 else 1000
+    presentations=int(sys.argv[2]) if len(sys.argv)>2 else 50
+    for limit in None,10:
+        memory,base,now=build(chunks,presentations,limit)
+        slow=run(memory,base,float('inf'))
+        fast=run(memory,base,0)
+        print('%d chunks, %d presentations each, limit %s: %.2fms, with numpy %.2fms (%.1fx)'%(
+              len(memory.dm),presentations,limit,slow*1000,fast*1000,slow/fast))
+    slow=later(*build(chunks,presentations))
+    fast=later(*build(chunks,presentations,error=0.01))
+    print('%d chunks over time: %.2fms, cached with error 0.01 %.2fms (%.1fx)'%(
+          chunks,slow*1000,fast*1000,slow/fast))
@@ -0,0 +1,54 @@
+"""Measure the cost of attribute writes that fire `changes` triggers.
+
+A writer module sets several attributes every step while a set of watcher
+processes wait on the top-level `changes` trigger, the same pattern that
+productions and motor modules produce.
+
+Run with:  python benchmarks/bench_changes.py [watchers] [simulated_seconds]
+"""
+import sys
+import time
+
+sys.path.insert(0,'.')
+
+import python_actr
+
+class Writer(python_actr.Model):
+    def start(self):
+        while True:
+            self.a=self.now()
+            self.b=1
+            self.c=2
+            self.d=3
+            self.e=4
+            yield 0.05
+
+class Watcher(python_actr.Model):
+    count=0
+    def start(self):
+        while True:
+            yield self.parent.changes
+            self.__dict__['count']+=1
+
+def build(watchers):
+    class World(python_actr.Model):
+        pass
+    world=World()
+    world.writer=Writer()
+    for i in range(watchers):
+        setattr(world,'watcher%d'%i,Watcher())
+    return world
+
+def run(watchers=100,limit=20.0):
+    world=build(watchers)
+    start=time.perf_counter()
+    world.run(limit=limit)
+    elapsed=time.perf_counter()-start
+    writes=int(limit/0.05)*5
+    return writes,elapsed
+
+if __name__=='__main__':
+    watchers=int(sys.argv[1]) if len(sys.argv)>1 else 100
+    limit=float(sys.argv[2]) if len(sys.argv)>2 else 20.0
+    writes,elapsed=run(watchers,limit)
+    print('%d watchers, %d writes in %.3fs: %.0f writes/sec'%(watchers,writes,elapsed,writes/elapsed))
@@ -0,0 +1,79 @@
+"""Measure how fast productions fire in the unit 1 and 2 tutorials.
+
+Each tutorial is run with its production actions run through exec() and
+with them compiled into functions, and the time spent firing productions
+is reported.  The tutorials are written for the old ccm package name, so
+they are copied to a temporary directory with their imports changed and
+their display and logging calls taken out.
+
+Run with:  python benchmarks/bench_firing.py [repeats]
+"""
+import sys
+import os
+import io
+import re
+import time
+import tempfile
+import importlib
+import contextlib
+
+sys.path.insert(0,'.')
+
+import python_actr
+from python_actr import production
+
+tutorials=os.path.join('python_actr','tutorials','ACT-R Unit Tutorials')
+names=['u1_addition','u1_addition2','u1_count','u1_semantic','u2_match']
+
+def convert(source):
+    source=source.replace('from ccm.lib.actr import *','from python_actr import *')
+    source=re.sub(r'^import ccm$','import python_actr as ccm',source,flags=re.M)
+    return re.sub(r'^ *ccm\.(display|log_everything)\(.*$','',source,flags=re.M)
+
+def load(directory,name):
+    with open(os.path.join(tutorials,name+'.py')) as f:
+        source=convert(f.read())
+    with open(os.path.join(directory,'bench_'+name+'.py'),'w') as f:
+        f.write(source)
+
+class Timer:
+    """Wraps Production.fire to count firings and the time they take."""
+    def __init__(self):
+        self.fire=production.Production.fire
+        self.count=0
+        self.elapsed=0.0
+    def __enter__(self):
+        fire=self.fire
+        def timed(p,context):
+            start=time.perf_counter()
+            fire(p,context)
+            self.elapsed+=time.perf_counter()-start
+            self.count+=1
+        production.Production.fire=timed
+        return self
+    def __exit__(self,*args):
+        production.Production.fire=self.fire
+
+def run(name,repeats=20,compiled=True):
+    make_action=production.make_action
+    if not compiled: production.make_action=lambda *args: None
+    try:
+        with Timer() as timer, contextlib.redirect_stdout(io.StringIO()):
+            for i in range(repeats):
+                module='bench_'+name
+                if module in sys.modules: importlib.reload(sys.modules[module])
+                else: importlib.import_module(module)
+    finally:
+        production.make_action=make_action
+    return timer.count,timer.elapsed
+
+if __name__=='__main__':
+    repeats=int(sys.argv[1]) if len(sys.argv)>1 else 20
+    directory=tempfile.mkdtemp()
+    for name in names: load(directory,name)
+    sys.path.insert(0,directory)
+    for name in names:
+        n,slow=run(name,repeats,compiled=False)
+        n,fast=run(name,repeats,compiled=True)
+        print('%-12s %5d firings: exec %.1fus, compiled %.1fus per firing (%.1fx)'%(
+              name,n,slow/n*1e6,fast/n*1e6,slow/fast))
@@ -0,0 +1,62 @@
+"""Measure production matching as the number of productions grows.
+
+The model counts with its goal buffer while the extra rules test other
+buffers that never change, as happens after production compilation has
+added many specialised rules.  Productions need their source, so the model
+is written to a temporary module and imported.
+
+Run with:  python benchmarks/bench_matching.py [rules] [count]
+"""
+import sys
+import os
+import time
+import tempfile
+import importlib
+
+sys.path.insert(0,'.')
+
+import python_actr
+
+def source(rules,count):
+    lines=['from python_actr import *',
+           'class Agent(ACTR):',
+           '    goal=Buffer()',
+           '    imaginal=Buffer()',
+           '    visual=Buffer()',
+           '    def init():',
+           '        goal.set("count 0")',
+           '        imaginal.set("idle")',
+           '        visual.set("idle")']
+    for i in range(count):
+        lines.append('    def count%d(goal="count %d"):'%(i,i))
+        lines.append('        goal.set("count %d")'%(i+1))
+    for i in range(rules):
+        buffer=['imaginal','visual'][i%2]
+        lines.append('    def rule%d(%s="busy %d"):'%(i,buffer,i))
+        lines.append('        %s.set("idle")'%buffer)
+    return '\n'.join(lines)+'\n'
+
+def build(rules,count):
+    directory=tempfile.mkdtemp()
+    name='bench_matching_model_%d'%rules
+    with open(os.path.join(directory,name+'.py'),'w') as f:
+        f.write(source(rules,count))
+    sys.path.insert(0,directory)
+    try:
+        return importlib.import_module(name).Agent()
+    finally:
+        sys.path.remove(directory)
+
+def run(rules=500,count=200):
+    agent=build(rules,count)
+    start=time.perf_counter()
+    agent.run()
+    elapsed=time.perf_counter()-start
+    return count,elapsed,agent._matcher.deduplicated
+
+if __name__=='__main__':
+    rules=int(sys.argv[1]) if len(sys.argv)>1 else 500
+    count=int(sys.argv[2]) if len(sys.argv)>2 else 200
+    for n in (0,rules//4,rules):
+        cycles,elapsed,shared=run(n,count)
+        print('%4d extra rules: %d cycles in %.3fs: %.0f cycles/sec (%d shared tests)'%(n,cycles,elapsed,cycles/elapsed,shared))
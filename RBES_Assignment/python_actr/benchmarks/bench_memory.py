@@ -0,0 +1,57 @@
+"""Measure adding chunks to and finding them in a large declarative memory.
+
+Memory.add() looks for a copy of each chunk among those with the same slot
+values, and requests only test the chunks having the constant slot values
+they ask for.  Both are compared with scanning all of dm, as was done
+before Memory kept an index (adding by scanning takes quadratic time, so it
+is only timed for the smaller memories).
+
+Run with:  python benchmarks/bench_memory.py [chunks] [requests]
+"""
+import sys
+import time
+
+sys.path.insert(0,'.')
+
+import python_actr
+from python_actr.actr.dm import Memory
+from python_actr.actr.buffer import Buffer
+
+class Scanning(Memory):
+    def _find(self,chunk):
+        for c in self.dm:
+            if chunk==c: return c
+
+def text(i):
+    return 'fact%d group:g%d colour:c%d'%(i%(i//2+1),i%100,i%7)
+
+def add(memory,chunks):
+    start=time.perf_counter()
+    for i in range(chunks):
+        memory.add(text(i))
+    return time.perf_counter()-start
+
+def run(chunks,requests):
+    memory=Memory(Buffer())
+    added=add(memory,chunks)
+    scanned=add(Scanning(Buffer()),chunks) if chunks<=1000 else None
+
+    start=time.perf_counter()
+    for i in range(requests):
+        memory._matching('? group:g%d colour:c%d'%(i%100,i%7),None)
+    indexed=time.perf_counter()-start
+    start=time.perf_counter()
+    for i in range(requests):
+        pattern=python_actr.pattern.Pattern('? group:g%d colour:c%d'%(i%100,i%7))
+        [x for x in memory.dm if pattern.match(x) is not None]
+    full=time.perf_counter()-start
+    return len(memory.dm),added,scanned,indexed/requests,full/requests
+
+if __name__=='__main__':
+    chunks=int(sys.argv[1]) if len(sys.argv)>1 else 50000
+    requests=int(sys.argv[2]) if len(sys.argv)>2 else 100
+    for n in (chunks//100,chunks//10,chunks):
+        size,added,scanned,indexed,full=run(n,requests)
+        scanned='%.3fs'%scanned if scanned is not None else '-'
+        print('%6d chunks: add %.3fs (%s scanning), request %.3fms (%.3fms scanning)'%(
+              size,added,scanned,indexed*1000,full*1000))
@@ -0,0 +1,50 @@
+"""Measure the cost of calling methods of a model through its wrappers.
+
+Times plain wrapped methods, generator methods (each call schedules a new
+process) and Buffer.set, which productions call all the time.
+
+Run with:  python benchmarks/bench_methods.py [calls]
+"""
+import sys
+import time
+
+sys.path.insert(0,'.')
+
+import python_actr
+from python_actr import Buffer
+
+class Module(python_actr.Model):
+    def poke(self,x):
+        return x
+    def process(self):
+        yield 0
+
+class Environment(python_actr.Model):
+    module=Module()
+    buffer=Buffer()
+
+def timed(func,calls):
+    start=time.perf_counter()
+    func(calls)
+    return time.perf_counter()-start
+
+def run(calls=100000):
+    env=Environment()
+    env.run(limit=0)
+    def plain(n):
+        poke=env.module.poke
+        for i in range(n): poke(i)
+    def generators(n):
+        process=env.module.process
+        for i in range(n): process()
+        env.run()
+    def buffer_set(n):
+        set=env.buffer.set
+        for i in range(n): set('a b c')
+    return [(name,timed(func,calls)) for name,func in
+            [('method',plain),('generator',generators),('Buffer.set',buffer_set)]]
+
+if __name__=='__main__':
+    calls=int(sys.argv[1]) if len(sys.argv)>1 else 100000
+    for name,elapsed in run(calls):
+        print('%-10s %d calls in %.3fs: %.0f calls/sec'%(name,calls,elapsed,calls/elapsed))
@@ -0,0 +1,69 @@
+"""Measure matching large rule bases in several processes.
+
+None of the productions of the model is keyed on a constant, so all of
+them are matched again on every cycle.  The model is run with Matcher and
+with ParallelMatcher (threshold 0, so every cycle uses the pool), and the
+cycles per second are reported.  Productions need their source, so the
+model is written to a temporary module and imported.
+
+ParallelMatcher stays opt-in (ProductionSystem._parallel_matching) until
+this shows a speedup on several cores; on one core it runs at about 0.7x.
+
+Run with:  python benchmarks/bench_parallel.py [rules] [cycles] [processes]
+"""
+import sys
+import os
+import time
+import tempfile
+import importlib
+
+sys.path.insert(0,'.')
+
+import python_actr
+from python_actr.matcher import ParallelMatcher
+
+def source(rules):
+    lines=['from python_actr import *',
+           'class Agent(ACTR):',
+           '    goal=Buffer()',
+           '    def init():',
+           '        goal.set("count 0 x")',
+           '    def step(goal="count ?n x"):',
+           '        goal.set("count %d x"%(int(n)+1))']
+    for i in range(rules):
+        lines.append('    def rule%d(goal="count !%d y"):'%(i,i))
+        lines.append('        pass')
+    return '\n'.join(lines)+'\n'
+
+def build(rules):
+    directory=tempfile.mkdtemp()
+    name='bench_parallel_model_%d'%rules
+    with open(os.path.join(directory,name+'.py'),'w') as f:
+        f.write(source(rules))
+    sys.path.insert(0,directory)
+    try:
+        return importlib.import_module(name).Agent
+    finally:
+        sys.path.remove(directory)
+
+def run(Agent,cycles,processes=None):
+    if processes: Agent=type('ParallelAgent',(Agent,),{'_parallel_matching':processes})
+    agent=Agent()
+    start=time.perf_counter()
+    agent.run(limit=cycles*agent.production_time)
+    elapsed=time.perf_counter()-start
+    if processes: agent._matcher.close()
+    return cycles/elapsed
+
+if __name__=='__main__':
+    rules=int(sys.argv[1]) if len(sys.argv)>1 else 10000
+    cycles=int(sys.argv[2]) if len(sys.argv)>2 else 50
+    processes=int(sys.argv[3]) if len(sys.argv)>3 else os.cpu_count()
+    ParallelMatcher.threshold=0
+    for n in (rules//10,rules):
+        Agent=build(n)
+        run(Agent,20)    # factoring and compiling the patterns
+        serial=run(Agent,cycles)
+        parallel=run(Agent,cycles,processes)
+        print('%6d rules: %.1f cycles/sec, with %d processes %.1f cycles/sec (%.1fx)'%(
+              n,serial,processes,parallel,parallel/serial))
@@ -0,0 +1,52 @@
+"""Measure partial matching of requests against a large declarative memory.
+
+Chunks are scored against a request with Partial's similarities by its
+PartialMatcher, and by Pattern calling Partial.match() for each slot (which
+is what happens when match() is overridden).
+
+Run with:  python benchmarks/bench_partial.py [chunks] [requests]
+"""
+import sys
+import time
+
+sys.path.insert(0,'.')
+
+import python_actr
+from python_actr.actr.dm import Memory,Partial
+from python_actr.actr.buffer import Buffer
+
+class PerSlot(Partial):
+    def match(self,key,a,b):
+        return Partial.match(self,key,a,b)
+
+def build(chunks,kind):
+    memory=Memory(Buffer())
+    for i in range(chunks):
+        memory.add('item%d position:p%d group:g%d colour:c%d'%(i,i%10,i%50,i%7))
+    partial=kind(memory)
+    for i in range(9):
+        partial.similarity('p%d'%i,'p%d'%(i+1),-0.5)
+        partial.similarity('c%d'%(i%7),'c%d'%((i+1)%7),-0.25)
+    return memory,partial
+
+def run(chunks,requests,kind):
+    memory,partial=build(chunks,kind)
+    start=time.perf_counter()
+    for i in range(requests):
+        text='? position:p%d group:g%d colour:c%d'%(i%10,i%50,i%7)
+        matcher=partial.matcher()
+        if matcher is None:
+            pattern=python_actr.pattern.Pattern(text,None,partial=partial)
+            scores=[x._partial for x in memory.dm if pattern.match(x) is not None]
+        else:
+            matches,scores=matcher.matches(text,None,memory.dm)
+    return time.perf_counter()-start
+
+if __name__=='__main__':
+    chunks=int(sys.argv[1]) if len(sys.argv)>1 else 5000
+    requests=int(sys.argv[2]) if len(sys.argv)>2 else 50
+    for n in (chunks//100,chunks//10,chunks):
+        slow=run(n,requests,PerSlot)
+        fast=run(n,requests,Partial)
+        print('%6d chunks: per slot %.2fms, matrix %.2fms per request (%.1fx)'%(
+              n,slow/requests*1000,fast/requests*1000,slow/fast))
@@ -0,0 +1,53 @@
+"""Compare the interpreted and compiled pattern matchers.
+
+Matches a production-style pattern against buffers and a retrieval-style
+pattern against chunks holding text and chunks holding numbers, first with the interpreted matcher (a
+chain of small functions) and then with the compiled one.
+
+Run with:  python benchmarks/bench_patterns.py [repeats]
+"""
+import sys
+import time
+
+sys.path.insert(0,'.')
+
+import python_actr
+from python_actr.pattern import Pattern
+from python_actr.actr.buffer import Chunk,Buffer
+
+def buffer(chunk):
+    b=Buffer()
+    b.set(chunk)
+    return b
+
+context={'goal':buffer('add 3 4 count:2 sum:5'),'retrieval':buffer('count 2 3'),
+         'memory':python_actr.Model(busy=False,error=False)}
+production={'goal':'add ?num1 ?num2 count:?count sum:?sum','retrieval':'count ?count ?next',
+            'memory':'busy:False error:!True'}
+chunks=[Chunk('count %d %d'%(i,i+1)) for i in range(100)]+[Chunk('add %d %g'%(i,i*0.5)) for i in range(100)]
+numeric=[Chunk({0:'count',1:i,2:i+1}) for i in range(100)]+[Chunk({0:'add',1:i,2:i*0.5}) for i in range(100)]
+
+def timed(pattern,objs,repeats):
+    match=pattern.match
+    start=time.perf_counter()
+    for i in range(repeats):
+        for obj in objs: match(obj)
+    return time.perf_counter()-start
+
+def run(repeats=2000):
+    results=[]
+    for name,spec,objs in [('production',production,[context]*10),('retrieval','count 50 ?',chunks),
+                          ('numeric','count 50 ?',numeric)]:
+        interpreted=Pattern(spec)
+        interpreted.compiled=None
+        interpreted._tests=None
+        compiled=Pattern(spec)
+        compiled.compile()
+        assert [interpreted.match(o) for o in objs]==[compiled.match(o) for o in objs]
+        results.append((name,len(objs)*repeats,timed(interpreted,objs,repeats),timed(compiled,objs,repeats)))
+    return results
+
+if __name__=='__main__':
+    repeats=int(sys.argv[1]) if len(sys.argv)>1 else 2000
+    for name,count,interpreted,compiled in run(repeats):
+        print('%-10s %d matches: interpreted %.3fs, compiled %.3fs (%.1fx)'%(name,count,interpreted,compiled,interpreted/compiled))
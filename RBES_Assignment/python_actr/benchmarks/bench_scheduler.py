@@ -0,0 +1,36 @@
+"""Measure raw Scheduler throughput in events per second.
+
+Run with:  python benchmarks/bench_scheduler.py [processes] [simulated_seconds] [queue]
+"""
+import sys
+import time
+
+sys.path.insert(0,'.')
+
+from python_actr import scheduler
+
+DELAYS=[0.05,0.085,0.25,0.05,0.1]
+
+def process(sch,counter,delay):
+    while True:
+        counter[0]+=1
+        yield delay
+
+def run(processes=1000,limit=10.0,queue='heap'):
+    sch=scheduler.Scheduler(queue)
+    counter=[0]
+    for i in range(processes):
+        sch.add(process,args=[sch,counter,DELAYS[i%len(DELAYS)]])
+    sch.add(sch.stop,limit,priority=-9999999)
+    start=time.perf_counter()
+    sch.run()
+    elapsed=time.perf_counter()-start
+    return counter[0],elapsed
+
+if __name__=='__main__':
+    processes=int(sys.argv[1]) if len(sys.argv)>1 else 1000
+    limit=float(sys.argv[2]) if len(sys.argv)>2 else 10.0
+    queues=sys.argv[3:] or sorted(scheduler.queues)
+    for queue in queues:
+        events,elapsed=run(processes,limit,queue)
+        print('%-8s %d processes, %d events in %.3fs: %.0f events/sec'%(queue,processes,events,elapsed,events/elapsed))
@@ -0,0 +1,46 @@
+"""Measure spreading activation over a large vocabulary.
+
+A fan-effect memory is scaled up: each chunk relates a person to a place
+(and a few other slots) drawn from a large vocabulary, and the goal holds
+a person and a place.  Spreading to every chunk is found a chunk at a
+time and with DMSpreading's matrix from values to chunks.
+
+Run with:  python benchmarks/bench_spreading.py [chunks] [vocabulary]
+"""
+import sys
+import time
+import random
+
+sys.path.insert(0,'.')
+
+import python_actr
+from python_actr.actr.dm import Memory,DMSpreading
+from python_actr.actr.buffer import Buffer
+
+def build(chunks,vocabulary):
+    goal=Buffer()
+    memory=Memory(Buffer())
+    spreading=DMSpreading(memory,goal)
+    rng=random.Random(1)
+    for i in range(chunks):
+        memory.add('fact%d person:p%d place:l%d time:t%d kind:k%d'%(
+                   i,rng.randrange(vocabulary),rng.randrange(vocabulary),
+                   rng.randrange(vocabulary//10+1),rng.randrange(5)))
+    goal.set('person:p1 place:l2 time:t3 kind:k0')
+    return memory,spreading
+
+def run(memory,spreading,vectorized,repeats=10):
+    spreading.vectorized=vectorized
+    start=time.perf_counter()
+    for i in range(repeats):
+        spreading.activation_many(memory.dm)
+    return (time.perf_counter()-start)/repeats
+
+if __name__=='__main__':
+    chunks=int(sys.argv[1]) if len(sys.argv)>1 else 20000
+    vocabulary=int(sys.argv[2]) if len(sys.argv)>2 else 2000
+    for n in (chunks//100,chunks//10,chunks):
+        memory,spreading=build(n,vocabulary)
+        slow=run(memory,spreading,float('inf'))
+        fast=run(memory,spreading,0)
+        print('%6d chunks: %.2fms, with the matrix %.2fms (%.1fx)'%(n,slow*1000,fast*1000,slow/fast))
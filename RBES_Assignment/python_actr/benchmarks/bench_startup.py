@@ -0,0 +1,60 @@
+"""Measure how long it takes to build a population of ACT-R agents.
+
+Each agent has goal and retrieval buffers, a declarative memory with noise
+and base-level learning, a motor module and a handful of productions.  All
+of them are added to one environment, which converts them as they arrive.
+
+Run with:  python benchmarks/bench_startup.py [agents]
+"""
+import sys
+import time
+
+sys.path.insert(0,'.')
+
+import python_actr
+from python_actr import ACTR,Buffer,Memory,DMNoise,DMBaseLevel
+from python_actr.actr import Motor
+
+class Agent(ACTR):
+    goal=Buffer()
+    retrieval=Buffer()
+    memory=Memory(retrieval,latency=0.1,threshold=-3)
+    DMNoise(memory,noise=0.3)
+    DMBaseLevel(memory)
+    motor=Motor()
+
+    def init():
+        memory.add('count 0 1')
+        memory.add('count 1 2')
+        goal.set('count 0 start')
+
+    def request(goal='count ?a start',memory='busy:False'):
+        memory.request('count ?a ?')
+        goal.set('count ?a wait')
+
+    def recalled(goal='count ?a wait',retrieval='count ?a ?b'):
+        goal.set('count ?b start')
+        retrieval.clear()
+
+    def failed(goal='count ?a wait',memory='error:True'):
+        goal.set('done')
+
+    def respond(goal='done',motor='busy:False'):
+        motor.press('x')
+        goal.set('stop')
+
+class Environment(python_actr.Model):
+    pass
+
+def run(agents=1000):
+    start=time.perf_counter()
+    env=Environment()
+    for i in range(agents):
+        setattr(env,'agent%d'%i,Agent())
+    elapsed=time.perf_counter()-start
+    return env,elapsed
+
+if __name__=='__main__':
+    agents=int(sys.argv[1]) if len(sys.argv)>1 else 1000
+    env,elapsed=run(agents)
+    print('%d agents in %.3fs: %.2f ms/agent'%(agents,elapsed,elapsed*1000/agents))
@@ -0,0 +1,61 @@
+"""Measure conflict resolution when many productions match at once.
+
+Every production of the model matches on every cycle, and their utilities
+come from PMPGC and PMNoise, so choosing one needs a utility and a noise
+value for each of them.  This is done with the usual adaptor calls and with
+_numpy_utilities.  Productions need their source, so the model is written
+to a temporary module and imported.
+
+Run with:  python benchmarks/bench_utilities.py [rules] [cycles]
+"""
+import sys
+import os
+import time
+import tempfile
+import importlib
+
+sys.path.insert(0,'.')
+
+import python_actr
+
+def source(rules):
+    lines=['from python_actr import *',
+           'class Agent(ACTR):',
+           '    goal=Buffer()',
+           '    pgc=PMPGC()',
+           '    noise=PMNoise(noise=0.3)',
+           '    def init():',
+           '        goal.set("go")',
+           '        self.count=0']
+    for i in range(rules):
+        lines.append('    def rule%d(goal="go"):'%i)
+        lines.append('        self.count+=1')
+    return '\n'.join(lines)+'\n'
+
+def build(rules):
+    directory=tempfile.mkdtemp()
+    name='bench_utilities_model_%d'%rules
+    with open(os.path.join(directory,name+'.py'),'w') as f:
+        f.write(source(rules))
+    sys.path.insert(0,directory)
+    try:
+        return importlib.import_module(name).Agent
+    finally:
+        sys.path.remove(directory)
+
+def run(Agent,cycles=200,numpy=False):
+    if numpy: Agent=type('NumpyAgent',(Agent,),{'_numpy_utilities':True})
+    agent=Agent()
+    start=time.perf_counter()
+    agent.run(limit=cycles*agent.production_time)
+    elapsed=time.perf_counter()-start
+    return agent.count,elapsed
+
+if __name__=='__main__':
+    rules=int(sys.argv[1]) if len(sys.argv)>1 else 1000
+    cycles=int(sys.argv[2]) if len(sys.argv)>2 else 200
+    for n in (10,rules//10,rules):
+        Agent=build(n)
+        count,slow=run(Agent,cycles)
+        count,fast=run(Agent,cycles,numpy=True)
+        print('%5d rules: %d cycles in %.3fs, with numpy %.3fs (%.1fx)'%(n,count,slow,fast,slow/fast))
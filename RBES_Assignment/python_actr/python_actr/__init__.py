@@ -1,7 +1,9 @@
-from .model import Model, log_everything
+from .model import Model, log_everything, unwrapped
 from .production import ProductionSystem
 from .logger import log, finished
+from .profiler import profile_productions
 from .runner import run, run_with
+from .multi import run_replications
 from .display import display
 from .actr import *
 from . import version
@@ -1,9 +1,11 @@
 import python_actr
 
 from collections import UserDict
+from python_actr.pattern import symbol
 
 class Chunk(UserDict):
   def __init__(self,contents,bound=None):
+    self._symbols={}
     UserDict.__init__(self)
     if isinstance(contents,Chunk):
       self.update(contents)
@@ -24,6 +26,16 @@ class Chunk(UserDict):
         self.update(contents)
       except:  
         raise Exception('Unknown contents for chunk:',contents)      
+  def __setitem__(self,key,value):
+    self.data[key]=value
+    self._symbols[key]=symbol(value)
+  def __delitem__(self,key):
+    del self.data[key]
+    del self._symbols[key]
+  def __copy__(self):
+    c=UserDict.__copy__(self)
+    c._symbols=dict(self._symbols)
+    return c
   def __repr__(self):
     #
     r=[]
@@ -43,11 +55,13 @@ class Chunk(UserDict):
 class Buffer(python_actr.Model):
   def __init__(self):
     self.chunk=None
+  @python_actr.unwrapped
   def set(self,chunk):
     try:
       self.chunk=Chunk(chunk,self.sch.bound)
     except AttributeError:
       self.chunk=Chunk(chunk,{})  
+  @python_actr.unwrapped
   def modify(self,**args):
     for k,v in list(args.items()):
       if k.startswith('_'): k=int(k[1:])
@@ -57,6 +71,12 @@ class Buffer(python_actr.Model):
       self.chunk=self.chunk
   def __getitem__(self,key):
     return self.chunk[key]
+  @property
+  def _symbols(self):
+    chunk=self.chunk
+    if chunk is None: return None
+    return chunk._symbols
+  @python_actr.unwrapped
   def clear(self):
     self.chunk=None  
   def __eq__(self,other):
@@ -66,5 +86,6 @@ class Buffer(python_actr.Model):
   def __len__(self):
     if self.chunk is None: return 0
     return len(self.chunk)
+  @python_actr.unwrapped
   def isEmpty(self):
     return len(self)==0
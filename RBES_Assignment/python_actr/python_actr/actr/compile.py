@@ -1,5 +1,5 @@
 from python_actr.actr.pm import ProceduralSubModule
-from python_actr.production import Production
+from python_actr.production import Production, make_action, variables
 from python_actr.pattern import Pattern
 
 class CompiledProduction(Production):
@@ -41,6 +41,23 @@ class CompiledProduction(Production):
 
         self.func=compile(self.code,'<production-%s>'%self.name,'exec')
 
+        # the same without assigning the variables, which fire() adds to the
+        # bound variables instead, so it can be run as a function
+        constants=dict(pre_bound)
+        for k,v in list(post_bound.items()):
+            if constants.get(k,v)!=v:
+                constants=None
+                break
+            constants[k]=v
+        if constants is None:
+            self.action_code=None
+        else:
+            self.action_code='\n%s\n%s'%('\n'.join(code1.splitlines()[len(pre_bound):]),
+                                         '\n'.join(code2.splitlines()[len(post_bound):]))
+        self.constants=constants
+        self.action=None
+        self.action_context=None
+
         
         keys=list(pre.keys)
         patterns={}
@@ -61,12 +78,26 @@ class CompiledProduction(Production):
         self.keys=keys
         self.pattern_specs=patterns
         self.pattern=Pattern(patterns)
+        self.variables=variables(patterns)|frozenset(constants or ())
+
+    def bind(self,context):
+        if self.action_code is None: self.action=None
+        else: self.action=make_action(self.name,self.action_code,self.variables,context)
+        self.action_context=context
+
+    def fire(self,context):
+        if self.constants:
+            bound=dict(self.bound)
+            bound.update(self.constants)
+            self.bound=bound
+        Production.fire(self,context)
        
       
 
         
 
 class PMCompile(ProceduralSubModule):
+    _cacheable=True
     def __init__(self,keep,request,retrieve):
         if not isinstance(keep,(list,tuple)): keep=(keep,)
         self.keep=keep
@@ -1,66 +1,97 @@
 
 import python_actr
 import typing
+from python_actr.production import ProductionCycle
+
+try:
+    import numpy
+except ImportError:
+    numpy=None
+
+class ACTRProductionCycle(ProductionCycle):
+    # adds utilities, thresholds, adaptors and a final check that the chosen
+    # production still matches before it fires
+    def step(self):
+        s=self.system
+        while True:
+            if self.state=='start':
+                s._calc_context()
+                for i in s._initializers:
+                    i.fire(s._context)
+                self.state='cycle'
+            elif self.state=='fire':
+                choice=self.choice
+                self.choice=None
+                self.state='cycle'
+                if not s._matcher.unchanged(choice) and not choice.match(s._context):
+                    #self.log.change_detected='before firing '+choice.name
+                    s.log.production='(changed before firing)'
+                    continue
+                for a in s._adaptors: a.firing(choice)
+                s.log.production=None
+                #self.log.firing=choice.name
+                if s._profile is None: choice.fire(s._context)
+                else: s._profile.fire(choice,s._context)
+                return dict(delay=0,priority=-1000)      # delay so we don't try to match again until after the result of production firing has had a chance to occur
+            if self.state=='cycle' and s.production_match_delay>0:
+                self.state='match'
+                return s.production_match_delay
+            self.state='cycle'
+            match=s._matcher.match()
+            if len(match)==0:
+                return s._top.changes
+            a,options=s.best_productions(match)
+
+            threshold=s.production_threshold
+            if isinstance(threshold, typing.Callable): threshold=threshold()
+
+            if threshold is not None and a<threshold:
+                for a in s._adaptors: a.below_threshold()
+                return s._top.changes
+            choice=s.random.choice(options)
+
+            for a in s._adaptors: a.selecting(choice)
+            #self.log.selected=choice.name
+            s.log.production=choice.name
+
+            t=s.production_time
+            if isinstance(t, typing.Callable): t=t()
+            if s.production_time_sd is not None:
+                t=t+s.random.gauss(0,s.production_time_sd)
+            t-=s.production_match_delay
+            if t<0: t=0
+            self.choice=choice
+            self.state='fire'
+            return t
 
 class ACTR(python_actr.ProductionSystem):
     production_time_sd=None
     production_threshold=None
+    _production_cycle=ACTRProductionCycle
+    _numpy_utilities=False     # work out utilities with numpy, if installed
     
     def __init__(self,log=None):
         #ccm.ProductionSystem.__init__(self,log=log)
         #print(self,"ACTR")
         super(ACTR,self).__init__(log=log)
         self._adaptors=[]
-    
-    def _process_productions(self):
-        self._calc_context()          
-        for i in self._initializers:
-            i.fire(self._context)
-        while True:
-            if self.production_match_delay>0: yield self.production_match_delay 
-            match=[p for p in self._productions if p.match(self._context)]
-            if len(match)==0:
-                yield self._top.changes
-            else:
-                activations=[self.get_activation(p) for p in match]
-                a=max(activations)
-                
-                threshold=self.production_threshold
-                if isinstance(threshold, typing.Callable): threshold=threshold()
-                
-                if threshold is not None and a<threshold:
-                    for a in self._adaptors: a.below_threshold()
-                    yield self._top.changes
-                    continue    
-                options=[p for (i,p) in enumerate(match) if activations[i]==a]
-                choice=self.random.choice(options)
-                
-                for a in self._adaptors: a.selecting(choice)
-                #self.log.selected=choice.name
-                self.log.production=choice.name
-                
-                t=self.production_time
-                if isinstance(t, typing.Callable): t=t()
-                if self.production_time_sd is not None:
-                    t=t+self.random.gauss(0,self.production_time_sd)
-                t-=self.production_match_delay
-                if t<0: t=0
-                yield t
-                
-                if not choice.match(self._context):
-                  #self.log.change_detected='before firing '+choice.name
-                  self.log.production='(changed before firing)'
-                else:  
-                  for a in self._adaptors: a.firing(choice)
-                  self.log.production=None
-                  #self.log.firing=choice.name
-                  choice.fire(self._context)
-                  yield dict(delay=0,priority=-1000)      # delay so we don't try to match again until after the result of production firing has had a chance to occur
+        self._utilities={}     # production -> utility from _adaptors[:_cached]
+        self._cached=0
     
     def add_adaptor(self,module):
         self._adaptors.append(module)
         for p in self._productions:
             module.create(p)
+        # utilities are summed in order, so only the adaptors before the
+        # first one that can't be cached are kept
+        self._cached=0
+        while self._cached<len(self._adaptors) and self._adaptors[self._cached]._cacheable:
+            self._cached+=1
+        self.utility_changed()
+
+    def utility_changed(self,production=None):
+        if production is None: self._utilities.clear()
+        else: self._utilities.pop(production,None)
             
     def reward(self,value):
         for a in self._adaptors:
@@ -84,9 +115,38 @@ class ACTR(python_actr.ProductionSystem):
                     return self.get_activation(p)
             return None
         else:
-            activation=production.base_utility
-            for a in self._adaptors:
+            activation=self._cached_utility(production)
+            for a in self._adaptors[self._cached:]:
                 activation+=a.utility(production)
             return activation
+
+    def _cached_utility(self,production):
+        activation=self._utilities.get(production)
+        if activation is None:
+            activation=production.base_utility
+            for a in self._adaptors[:self._cached]:
+                activation+=a.utility(production)
+            self._utilities[production]=activation
+        return activation
+
+    def best_productions(self,productions):
+        """Returns the highest utility of productions and those that have it.
+
+        With _numpy_utilities the utilities of all of them are worked out
+        together: each adaptor gives an array with its part for every
+        production (PMNoise draws all its noise at once), and the maximum
+        is found with numpy.  Without noise the utilities are exactly the
+        same; noise comes from a different generator, with the same
+        distribution.
+        """
+        if self._numpy_utilities and numpy is not None:
+            u=numpy.fromiter((self._cached_utility(p) for p in productions),float,len(productions))
+            for a in self._adaptors[self._cached:]:
+                u+=a.utilities(productions)
+            best=u.max()
+            return float(best),[productions[i] for i in numpy.flatnonzero(u==best)]
+        activations=[self.get_activation(p) for p in productions]
+        best=max(activations)
+        return best,[p for (i,p) in enumerate(productions) if activations[i]==best]
             
        
@@ -1,18 +1,44 @@
 
 import python_actr
 import math
+import itertools
+
+try:
+  import numpy
+except ImportError:
+  numpy=None
 
 __all__=['Memory','MemorySubModule','DMNoise','DMBaseLevel','DMSalience','DMSpreading','DMFixed',
          'Partial','BlendingMemory','DMAssociate','DMInhibition']
 
 from .buffer import Chunk,Buffer
+from python_actr import pattern as patterns
 from python_actr.pattern import Pattern
+from python_actr.scheduler import Process
+
+class ChunkList(list):
+  """The chunks in a Memory, counting the changes made to them in version,
+  so the memory can tell when its indexes are out of date."""
+  version=0
+
+def _changing(name):
+  method=getattr(list,name)
+  def changing(self,*args,**keys):
+    self.version+=1
+    return method(self,*args,**keys)
+  changing.__name__=name
+  return changing
+
+for _name in ['__setitem__','__delitem__','__iadd__','__imul__','append','extend',
+              'insert','pop','remove','clear','sort','reverse']:
+  setattr(ChunkList,_name,_changing(_name))
 
 class Memory(python_actr.Model):
+  _numpy_noise=False     # DMNoise draws for all the chunks at once with numpy
   def __init__(self,buffer,latency=0.05,threshold=0,maximum_time=10.0,finst_size=4,finst_time=3.0):
     python_actr.Model.__init__(self)
     self._buffer=buffer
-    self.dm=[]
+    self.dm=ChunkList()
     self.error=False
     self.busy=False
     self.adaptors=[]
@@ -23,9 +49,77 @@ class Memory(python_actr.Model):
     self.finst=Finst(self,size=finst_size,time=finst_time)
     self.record_all_chunks=False
     self._request_count=0
+    self._reindex()
     
   def clear(self):
     del self.dm[:]
+    self._reindex()
+
+  def _reindex(self):
+    # _postings has the positions in dm of the chunks with each (slot,value)
+    # and _contents has the chunks with each set of slot values, for finding
+    # copies.  Both are kept up to date by add(); if dm has been changed
+    # some other way (or is not a ChunkList) they are made again.
+    self._postings={}
+    self._contents={}
+    self._indexed=0
+    for chunk in self.dm: self._index(chunk)
+    self._indexed_dm=self.dm
+    self._indexed_version=getattr(self.dm,'version',None)
+
+  def _stale(self):
+    dm=self.dm
+    return not isinstance(dm,ChunkList) or dm is not self._indexed_dm or dm.version!=self._indexed_version
+
+  def _index(self,chunk):
+    postings=self._postings
+    for item in chunk._symbols.items():
+      p=postings.get(item)
+      if p is None: p=postings[item]=set()
+      p.add(self._indexed)
+    self._contents.setdefault(self._contents_key(chunk),[]).append(chunk)
+    self._indexed+=1
+
+  def _contents_key(self,chunk):
+    # chunks that are == have the same key (True, 1 and 1.0 hash alike);
+    # chunks with values that can't be hashed share the key None
+    try:
+      return frozenset(chunk.data.items())
+    except TypeError:
+      return None
+
+  def _find(self,chunk):
+    # the first chunk in dm equal to chunk, or None
+    if self._stale(): self._reindex()
+    for c in self._contents.get(self._contents_key(chunk),()):
+      if chunk==c: return c
+    return None
+
+  def _candidates(self,tests):
+    # the chunks in dm that have the values tests require of their slots
+    dm=self.dm
+    if self._stale(): self._reindex()
+    postings=[]
+    for kind,name,key,arg in tests:
+      if kind=='eq' and name is None and type(arg) is str and patterns.plain(key):
+        p=self._postings.get((key,arg))
+        if p is None: return []
+        postings.append(p)
+    if not postings: return dm
+    postings.sort(key=len)
+    return [dm[i] for i in sorted(postings[0].intersection(*postings[1:]))]
+
+  def _matching(self,pattern,bound,chunks=None):
+    # the chunks in dm (or in chunks, which are in dm) matching pattern
+    funcs,funcs2=patterns.tests(pattern,bound)
+    candidates=self._candidates(funcs)
+    if chunks is not None and candidates is not self.dm:
+      keep=set(map(id,chunks))
+      candidates=[x for x in candidates if id(x) in keep]
+    elif chunks is not None:
+      candidates=chunks
+    pattern=patterns.from_tests(funcs,funcs2)
+    return [x for x in candidates if pattern.match(x) is not None]
     
   def add(self,chunk,record=None,**keys):
     if self.error: self.error=False
@@ -36,20 +130,20 @@ class Memory(python_actr.Model):
       if hasattr(self,'sch'):
         bound=getattr(self.sch,'bound',None)
       chunk=Chunk(chunk,bound)
-    for c in self.dm:
-      if chunk==c:
-        for a in self.adaptors: a.merge(c,**keys)
-        break
+    c=self._find(chunk)
+    if c is not None:
+      for a in self.adaptors: a.merge(c,**keys)
     else:
       for a in self.adaptors: a.create(chunk,**keys)
       self.dm.append(chunk)
+      self._index(chunk)
+      self._indexed_version=getattr(self.dm,'version',None)
     chunk.record=record
 
       
   def find_matching_chunks(self,pattern,threshold=None):
      bound=getattr(self.sch,'bound',None)
-     pattern=Pattern(pattern,bound)
-     matches=[x for x in self.dm if pattern.match(x) is not None]
+     matches=self._matching(pattern,bound)
      if threshold is not None:
        matches=[x for x in matches if self.get_activation(x)>=threshold]
      return matches  
@@ -61,12 +155,23 @@ class Memory(python_actr.Model):
      if self.error: self.error=False
      self._request_count+=1
      b=getattr(self.sch,'bound',None)
-     pattern=Pattern(pattern,b,partial=partial)
      
      all=self.dm
      if require_new: all=[x for x in all if not self.finst.contains(x)]
      
-     matches=[x for x in all if pattern.match(x) is not None]
+     found=None
+     if partial is not None and hasattr(partial,'matcher'):
+       matcher=partial.matcher()
+       if matcher is not None: found=matcher.matches(pattern,b,all)
+     if found is not None:
+       matches,scores=found
+     elif partial is None:
+       matches=self._matching(pattern,b,None if all is self.dm else all)
+       scores=None
+     else:
+       pattern=Pattern(pattern,b,partial=partial)
+       matches=[x for x in all if pattern.match(x) is not None]
+       scores=[x._partial for x in matches]
      
      #for x in matches: print `x`,self.get_activation(x)
      
@@ -76,10 +181,11 @@ class Memory(python_actr.Model):
          self.fail(self._request_count)
      else:
          maximum=None    
-         for chunk in matches:
-             chunk.activation=self.get_activation(chunk)
-             if partial is not None:
-               chunk.activation+=chunk._partial
+         activations=self.get_activations(matches)
+         for i,chunk in enumerate(matches):
+             chunk.activation=activations[i]
+             if scores is not None:
+               chunk.activation+=scores[i]
              if maximum is None or chunk.activation>maximum:
                maximum=chunk.activation
          if maximum<self.threshold:
@@ -91,27 +197,10 @@ class Memory(python_actr.Model):
              self.recall(choice,matches=matches,request_number=self._request_count)
      
   def fail(self,request_number):
-     if self.threshold is None: 
-         time=self.maximum_time
-     else:
-         time=self.latency*math.exp(-self.threshold)
-         if time>self.maximum_time: time=self.maximum_time 
-     yield time
-     if request_number!=self._request_count: return
-     
-     self.error=True
-     self._buffer.clear()
-     self.busy=False
+     return Retrieval(self,None,request_number)
   
   def recall(self,chunk,matches,request_number):
-     self.finst.add(chunk)
-     time=self.latency*math.exp(-chunk.activation)
-     if time>self.maximum_time: time=self.maximum_time
-     yield time
-     if request_number!=self._request_count: return
-     self._buffer.set(chunk)
-     for a in self.adaptors: a.recalled(chunk)
-     self.busy=False
+     return Retrieval(self,chunk,request_number)
      
   
   def get_activation(self,chunk):
@@ -120,12 +209,10 @@ class Memory(python_actr.Model):
            chunk=Chunk(chunk,self.sch.bound)
          except AttributeError:
            chunk=Chunk(chunk,None)           
-         for c in self.dm:
-             if chunk==c:
-                 chunk=c
-                 break
-         else:
+         c=self._find(chunk)
+         if c is None:
              raise Exception('No such chunk found')        
+         chunk=c
      act=0
      for a in self.adaptors:
         act+=a.activation(chunk)
@@ -133,9 +220,55 @@ class Memory(python_actr.Model):
          self.log[str(chunk)]=act 
      return act   
                 
+  def get_activations(self,chunks):
+     # get_activation() of each of chunks (which are in dm), with each
+     # adaptor doing them all at once if numpy is installed
+     if numpy is None or not self.adaptors:
+         return [self.get_activation(c) for c in chunks]
+     act=numpy.zeros(len(chunks))
+     for a in self.adaptors:
+        act+=a.activation_many(chunks)
+     act=act.tolist()
+     for chunk,a in zip(chunks,act):
+         if self.record_all_chunks or chunk.record is True:
+             self.log[str(chunk)]=a
+     return act
+                
   def add_adaptor(self,a):
      self.adaptors.append(a)
 
+class Retrieval(Process):
+  # a pending recall, or a failure if chunk is None; only the most recent
+  # request ever completes
+  def __init__(self,memory,chunk,request_number):
+      self.memory=memory
+      self.chunk=chunk
+      self.request_number=request_number
+      self.started=False
+  def step(self):
+      m=self.memory
+      chunk=self.chunk
+      if not self.started:
+          self.started=True
+          if chunk is None:
+              if m.threshold is None: 
+                  return m.maximum_time
+              time=m.latency*math.exp(-m.threshold)
+          else:
+              m.finst.add(chunk)
+              time=m.latency*math.exp(-chunk.activation)
+          if time>m.maximum_time: time=m.maximum_time
+          return time
+      if self.request_number!=m._request_count: return None
+      if chunk is None:
+          m.error=True
+          m._buffer.clear()
+      else:
+          m._buffer.set(chunk)
+          for a in m.adaptors: a.recalled(chunk)
+      m.busy=False
+      return None
+
 class Finst:
   def __init__(self,parent,size=4,time=3.0):
     self.parent=parent
@@ -167,6 +300,16 @@ class MemorySubModule:
     pass  
   def activation(self,chunk):
     return 0
+  def activation_many(self,chunks):
+    # activation() of each of chunks, as a numpy array; adaptors do this
+    # for all the chunks matching a request at once
+    return numpy.fromiter((self.activation(c) for c in chunks),float,len(chunks))
+  def checked(self,chunks,values):
+    # values that came out inf or nan are done again with activation(),
+    # so activation_many() raises whatever activation() would
+    for i in numpy.flatnonzero(~numpy.isfinite(values)):
+      values[i]=self.activation(chunks[i])
+    return values
   def recalled(self,chunk):
     pass
   def now(self):
@@ -180,8 +323,15 @@ class DMNoise(MemorySubModule):
     self.baseNoise=baseNoise  
   def create(self,chunk,**keys):
     chunk.baseNoise=self.logisticNoise(self.baseNoise)
+  _generator=None
   def activation(self,chunk):
     return chunk.baseNoise+self.logisticNoise(self.noise)
+  def activation_many(self,chunks):
+    n=len(chunks)
+    base=numpy.fromiter((c.baseNoise for c in chunks),float,n)
+    if getattr(self.parent,'_numpy_noise',False):
+      return base+self.logisticNoises(self.noise,n)
+    return base+numpy.fromiter((self.logisticNoise(self.noise) for i in range(n)),float,n)
   def logisticNoise(self,s):
     try:
       x=self.parent.random.random()
@@ -189,14 +339,51 @@ class DMNoise(MemorySubModule):
       import random
       x=random.random()
     return s*math.log(1.0/x-1.0)
+  def logisticNoises(self,s,n):
+    # n samples of logisticNoise(s) from a numpy generator seeded from the
+    # memory's random number generator
+    if self._generator is None:
+      self._generator=numpy.random.default_rng(self.parent.random.getrandbits(64))
+    x=self._generator.random(n)
+    return s*numpy.log(1.0/x-1.0)
       
 
 
+class BaseLevelCache:
+  # the sum of a chunk's older presentations when it was last computed,
+  # and its recent presentations, which are summed each time
+  def __init__(self,time,old,age,recent,count):
+    self.time=time        # when old was computed
+    self.old=old          # sum over the older presentations then
+    self.age=age          # age of the newest of them then
+    self.recent=recent    # times of the other presentations
+    self.count=count      # len(chunk.times) when this was up to date
+
+
 class DMBaseLevel(MemorySubModule):
-  def __init__(self,memory,decay=0.5,limit=None):
+  """Base-level activation: the log of the sum of the presentation ages
+  raised to -decay.
+
+  If limit is given, only that many presentations are kept and the rest
+  are approximated.  If error is given (and limit isn't), each chunk keeps
+  a BaseLevelCache, so its activation takes time in proportion to its
+  recent presentations rather than all of them, and differs from the
+  exact value by at most error.  The older presentations were all at
+  least age before the sum over them was computed, so after dt more their
+  sum has fallen by a factor between 1 and (1+dt/age)**-decay.  Half of
+  that fall (in log terms) is assumed, which is out by at most
+  decay/2*log(1+dt/age), and the sum is computed again when that is more
+  than error.  The recent presentations are the newest ones, when the
+  sum was computed, and the ones merged since (once there are twice as
+  many as there were, the sum is computed again).
+  """
+  vectorized=16   # chunks needed before activation_many() uses numpy
+  recent=8        # presentations summed each time when using error
+  def __init__(self,memory,decay=0.5,limit=None,error=None):
     MemorySubModule.__init__(self,memory)
     self.decay=decay
     self.limit=limit
+    self.error=error
   
   def create(self,chunk,time=0.0,baselevel=None,**keys):
     chunk.creation=self.now()
@@ -208,6 +395,10 @@ class DMBaseLevel(MemorySubModule):
   def merge(self,chunk,time=0.0,baselevel=None,**keys):
     chunk.times.append(self.now()-time)
     chunk.count+=1
+    cache=getattr(chunk,'_baselevel',None)
+    if cache is not None and cache.count==len(chunk.times)-1:
+      cache.recent.append(chunk.times[-1])
+      cache.count+=1
     if self.limit is not None and len(chunk.times)>self.limit:
       if self.limit==0: del chunk.times[:]
       else: chunk.times=chunk.times[-self.limit:]
@@ -215,11 +406,47 @@ class DMBaseLevel(MemorySubModule):
       if baselevel=='calculate': del chunk.baselevel
       else: chunk.baselevel=baselevel
     
+  def activation_many(self,chunks):
+    """The activation() of each of chunks, as a numpy array.
+
+    The presentation times of all the chunks are put in one array, with
+    the number belonging to each chunk in another, so every power is
+    taken at once and each chunk's are summed in order.  Fewer than
+    vectorized chunks, and chunks kept to within error, are done one at
+    a time.
+    """
+    n=len(chunks)
+    if self.decay==None: return numpy.zeros(n)
+    if n<self.vectorized or (self.error is not None and self.limit is None):
+      return MemorySubModule.activation_many(self,chunks)
+    d=self.decay
+    now=self.now()
+    counts=numpy.fromiter((len(c.times) for c in chunks),numpy.intp,n)
+    times=numpy.fromiter(itertools.chain.from_iterable(c.times for c in chunks),float,int(counts.sum()))
+    t=numpy.maximum(now-times,0.005)
+    owner=numpy.repeat(numpy.arange(n),counts)
+    B=numpy.bincount(owner,weights=numpy.power(t,-d),minlength=n)
+    if self.limit is not None:
+      total=numpy.fromiter((c.count for c in chunks),float,n)
+      tn=now-numpy.fromiter((c.creation for c in chunks),float,n)
+      first=numpy.fromiter((c.times[0] if c.times else now for c in chunks),float,n)
+      tk=now-first
+      with numpy.errstate(divide='ignore',invalid='ignore'):
+        approx=(total-counts)/(1-d)*(numpy.power(tn,1-d)-numpy.power(tk,1-d))/(tn-tk)
+      B+=numpy.where(total>counts,approx,0.0)
+    with numpy.errstate(divide='ignore',invalid='ignore'):
+      B=numpy.log(B)
+    for i,c in enumerate(chunks):
+      if hasattr(c,'baselevel'): B[i]=c.baselevel
+    return self.checked(chunks,B)
+
   def activation(self,chunk):
     if hasattr(chunk,'baselevel'):
       return chunk.baselevel
     if self.decay==None: 
       return 0
+    if self.error is not None and self.limit is None:
+      return self.cached(chunk)
     d=self.decay
     now=self.now()
     t=[now-time for time in chunk.times]
@@ -243,6 +470,28 @@ class DMBaseLevel(MemorySubModule):
     B=math.log(exact+approx)
     return B
 
+  def cached(self,chunk):
+    # activation() to within error, from the chunk's BaseLevelCache
+    d=self.decay
+    now=self.now()
+    cache=getattr(chunk,'_baselevel',None)
+    if cache is not None and cache.count==len(chunk.times) and now>=cache.time and len(cache.recent)<=2*self.recent:
+      dt=now-cache.time
+      if d/2*math.log1p(dt/cache.age)>self.error: cache=None
+    else:
+      cache=None
+    if cache is None:
+      times=sorted(chunk.times,reverse=True)
+      old=times[self.recent:]
+      if old: age=max(now-old[0],0.005)
+      else: age=float('inf')
+      total=sum([math.pow(max(now-time,0.005),-d) for time in old])
+      cache=chunk._baselevel=BaseLevelCache(now,total,age,times[:self.recent],len(chunk.times))
+      dt=0.0
+    recent=sum([math.pow(max(now-time,0.005),-d) for time in cache.recent])
+    old=cache.old*math.pow(1+dt/cache.age,-d/2)
+    return math.log(recent+old)
+
 class DMSpacing(MemorySubModule):
   def __init__(self,memory,decayScale=0.0,decayIntercept=0.5):
     MemorySubModule.__init__(self,memory)
@@ -279,6 +528,11 @@ class DMInhibition(MemorySubModule):
         tn=self.now()-chunk.mostRecentTime
         I=-math.log(1+math.pow(tn,-self.decayScale)/self.timeScale)
         return I
+    def activation_many(self,chunks):
+        tn=self.now()-numpy.fromiter((c.mostRecentTime for c in chunks),float,len(chunks))
+        with numpy.errstate(divide='ignore',invalid='ignore'):
+            I=-numpy.log(1+numpy.power(tn,-self.decayScale)/self.timeScale)
+        return self.checked(chunks,I)
 
 
 class DMSalience(MemorySubModule):
@@ -297,8 +551,7 @@ class DMSalience(MemorySubModule):
       self.histogram[k]={}
     
   def context(self,pattern):
-    pat=Pattern(pattern)
-    chunks=[x for x in self.memory.dm if pat.match(x) is not None]
+    chunks=self.memory._matching(pattern,None)
     for k,hist in list(self.histogram.items()):
       hist.clear()
     if len(chunks)==0: raise Exception('No chunks match salience pattern: "%s"'%pattern)
@@ -318,9 +571,31 @@ class DMSalience(MemorySubModule):
       act+=math.log(1.0/p,2)*w
 #    if self.log: self.log.act[`chunk`]=act
     return act  
+
+  def activation_many(self,chunks):
+    # each value's term is worked out once for all the chunks, and added
+    # in the same order as activation() does
+    act=numpy.zeros(len(chunks))
+    for k,hist in list(self.histogram.items()):
+      w=self.weight[k]
+      terms={}
+      for val,p in hist.items():
+        terms[val]=math.log(1.0/p,2)*w
+      act+=numpy.fromiter((terms[c.get(k,None)] for c in chunks),float,len(chunks))
+    return act
       
       
 class DMSpreading(MemorySubModule):
+  """Spreading activation from the slots of buffers to the chunks sharing them.
+
+  For activation_many() the values of the chunks are numbered, and each
+  chunk keeps the numbers of its values (a row of a sparse matrix from
+  chunks to values), so spreading to all of them takes one pass over the
+  rows, with the amount each value spreads worked out once.  That is
+  kept until a buffer changes or a chunk is created (which changes the
+  fan of its values).
+  """
+  vectorized=16   # chunks needed before activation_many() uses the matrix
   def __init__(self,memory,*buffers):
     MemorySubModule.__init__(self,memory)
     self.strength=1
@@ -329,6 +604,10 @@ class DMSpreading(MemorySubModule):
     for b in buffers: 
       self.weight[b]=1
     self.slots={}
+    self._columns={}       # value -> its number
+    self._rows={}          # id(chunk) -> (chunk,numbers of its values)
+    self._created=0
+    self._sources=None     # (what it depends on,spreading from each value)
     
   def create(self,chunk,**keys):
     for slot in list(chunk.values()):
@@ -336,6 +615,36 @@ class DMSpreading(MemorySubModule):
         self.slots[slot].append(chunk)
       else:
         self.slots[slot]=[chunk]
+    self._created+=1
+    self._row(chunk)
+
+  def _row(self,chunk):
+    row=self._rows.get(id(chunk))
+    if row is None or row[0] is not chunk:
+      columns=self._columns
+      numbers=[]
+      for slot in list(chunk.values()):
+        n=columns.get(slot)
+        if n is None: n=columns[slot]=len(columns)
+        if n not in numbers: numbers.append(n)
+      row=self._rows[id(chunk)]=(chunk,numbers)
+    return row[1]
+
+  def _spreading(self):
+    # the amount spread to chunks having each value, from the buffers
+    key=(self.strength,self._created,len(self._columns),
+         tuple((getattr(b,'_version',None),id(b.chunk),self.weight[b]) for b in self.buffers))
+    if self._sources is None or self._sources[0]!=key:
+      x=numpy.zeros(len(self._columns))
+      for b in self.buffers:
+        ch=b.chunk
+        if ch is not None:
+          w=self.weight[b]
+          for slot in list(ch.values()):
+            if slot in self.slots:
+              x[self._columns[slot]]+=w*(self.strength-math.log(len(self.slots[slot])+1))
+      self._sources=(key,x)
+    return self._sources[1]
   def activation(self,chunk):
     values=list(chunk.values())
   
@@ -349,6 +658,34 @@ class DMSpreading(MemorySubModule):
           s=self.strength-math.log(len(self.slots[slot])+1)
           total+=w*s
     return total      
+
+  def activation_many(self,chunks):
+    n=len(chunks)
+    if n>=self.vectorized:
+      rows=[self._row(c) for c in chunks]
+      x=self._spreading()
+      counts=numpy.fromiter(map(len,rows),numpy.intp,n)
+      columns=numpy.fromiter(itertools.chain.from_iterable(rows),numpy.intp,int(counts.sum()))
+      owner=numpy.repeat(numpy.arange(n),counts)
+      return numpy.bincount(owner,weights=x[columns],minlength=n)
+    # what each slot of the buffers adds is worked out once for all the
+    # chunks, and added in the same order as activation() does
+    sources=[]
+    for b in self.buffers:
+      ch=b.chunk
+      if ch is not None:
+        w=self.weight[b]
+        for key,slot in list(ch.items()):
+          if slot in self.slots:
+            sources.append((slot,w*(self.strength-math.log(len(self.slots[slot])+1))))
+    act=numpy.zeros(len(chunks))
+    for i,chunk in enumerate(chunks):
+      values=list(chunk.values())
+      total=0.0
+      for slot,x in sources:
+        if slot in values: total+=x
+      act[i]=total
+    return act
         
 class DMFixed(MemorySubModule):
   def __init__(self,memory,default=0):
@@ -361,6 +698,8 @@ class DMFixed(MemorySubModule):
     chunk.fixed+=fixed
   def activation(self,chunk):
     return chunk.fixed
+  def activation_many(self,chunks):
+    return numpy.fromiter((c.fixed for c in chunks),float,len(chunks))
 
 
 class Associated:
@@ -405,6 +744,24 @@ class DMAssociate(MemorySubModule):
         if c is not None:         
           act+=self._bl.activation(c)
     return act*self.weight
+  def activation_many(self,chunks):
+    # each association's activation is worked out once for all the chunks
+    prechunk=self._buffer.chunk
+    if prechunk is None: return numpy.zeros(len(chunks))
+    pre=list(prechunk.values())
+    known={}
+    result=numpy.empty(len(chunks))
+    for i,chunk in enumerate(chunks):
+      act=0
+      for pv in pre:
+        for v in list(chunk.values()):
+          c=self._mem.get((pv,v),None)
+          if c is not None:
+            a=known.get(id(c))
+            if a is None: a=known[id(c)]=self._bl.activation(c)
+            act+=a
+      result[i]=act*self.weight
+    return result
         
         
         
@@ -432,7 +789,111 @@ class Partial:
     m=self.sims.get((a,b),self.limit)
     p=self.strength
     return p*m
-    
+
+  def matcher(self):
+    # the PartialMatcher scoring requests for this, or None if match() is
+    # overridden (then each slot goes through match() as it is tested)
+    if type(self).match is not Partial.match: return None
+    m=self.__dict__.get('_matcher')
+    if m is None or not m.current(self):
+      m=self._matcher=PartialMatcher(self)
+    return m
+
+
+class PartialMatcher:
+  """Scores chunks against a pattern the way Partial would.
+
+  The values Partial has similarities for are numbered, and each has a
+  row of strength times its similarity with every one of them (0 for
+  itself), and one last column for all the other values.  A constant
+  without similarities only tells its own value from the rest, which is
+  a row of two.  The chunks that pass the pattern's other tests (which
+  must match exactly) are scored a slot at a time, with numpy if it is
+  installed.  Scores are returned rather than left on the chunks, so
+  nothing is changed by matching.
+  """
+  def __init__(self,partial):
+    self.strength=partial.strength
+    self.limit=partial.limit
+    self.sims=dict(partial.sims)
+    self.index={}
+    for pair in self.sims:
+      for value in pair:
+        value=patterns.symbol(value)
+        if value not in self.index: self.index[value]=len(self.index)
+    other=self.strength*self.limit
+    self.rows=[]
+    for a in self.index:
+      row=[0.0 if a==b else self.strength*self.sims.get((a,b),self.limit) for b in self.index]
+      row.append(other)
+      self.rows.append(self.array(row))
+    self.unknown=self.array([0.0,other])
+
+  def array(self,row):
+    if numpy is None: return row
+    return numpy.array(row,dtype=float)
+
+  def current(self,partial):
+    p=partial
+    return p.strength==self.strength and p.limit==self.limit and p.sims==self.sims
+
+  def matches(self,pattern,bound,chunks):
+    """(matches,scores) for a request, or None if it can't be scored here."""
+    funcs,funcs2=patterns.tests(pattern,bound)
+    scored=[]
+    exact=[]
+    for t in funcs:
+      kind,name,key,arg=t
+      if kind=='eq':
+        if type(arg) is not str or name is not None or not patterns.plain(key): return None
+        scored.append((key,patterns.symbol(arg)))
+      else:
+        exact.append(t)
+    for kind,name,key,arg in funcs2:
+      if kind=='eqvar': return None
+    if exact or funcs2:
+      rest=patterns.from_tests(exact,funcs2)
+      chunks=[x for x in chunks if rest.match(x) is not None]
+
+    # each chunk's value for each scored slot, as a column of its row; a
+    # chunk without one of the slots doesn't match
+    index=self.index
+    other=len(index)
+    lookups=[]
+    rows=[]
+    for key,value in scored:
+      i=index.get(value)
+      if i is None:
+        lookups.append((key,lambda v,value=value: 0 if v==value else 1))
+        rows.append(self.unknown)
+      else:
+        lookups.append((key,lambda v: index.get(v,other)))
+        rows.append(self.rows[i])
+    matches=[]
+    columns=[]
+    for chunk in chunks:
+      symbols=chunk._symbols
+      try:
+        columns.append([column(symbols[key]) for key,column in lookups])
+      except KeyError:
+        continue
+      matches.append(chunk)
+    if not matches or not scored: return matches,[0.0]*len(matches)
+
+    if numpy is not None:
+      columns=numpy.array(columns,dtype=numpy.intp)
+      scores=numpy.zeros(len(matches))
+      for i,row in enumerate(rows):
+        scores+=row[columns[:,i]]
+      return matches,scores.tolist()
+    scores=[]
+    for c in columns:
+      x=0.0
+      for i,row in enumerate(rows):
+        x+=row[c[i]]
+      scores.append(x)
+    return matches,scores
+
       
 class BlendingMemory(Memory):
   def recall(self,chunk,matches,request_number):
@@ -469,8 +930,7 @@ class BlendingMemory(Memory):
           total_activation+=m.exp_activation
       for b in bk:
         chunk[b]/=total_activation
-    for m in Memory.recall(self,chunk,matches,request_number):
-      yield m
+    return Memory.recall(self,chunk,matches,request_number)
       
     
   
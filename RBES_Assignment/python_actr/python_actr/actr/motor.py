@@ -1,4 +1,5 @@
 import python_actr
+from python_actr.scheduler import Process
 
 class Motor(python_actr.Model):
   def __init__(self):
@@ -6,18 +7,33 @@ class Motor(python_actr.Model):
     self.busy=False
 
   def press(self,key):
-    if self.busy: return
-    self.busy=True
-    self.log._='Pressing key preparation'
-    yield 0.25
-    self.log._='Pressing key preparation complete'
-    yield 0.05
-    self.log._='Pressing key initiation complete'
-    yield 0.1
-    self.log._='Actually pressing the key'
-    self.parent.parent.key_pressed(key)
-    self.log._='Finishing movement'
-    yield 0.15
-    self.log._='Finished movement'
-    self.busy=False
+    return Press(self,key)
+
+class Press(Process):
+  def __init__(self,motor,key):
+    self.motor=motor
+    self.key=key
+    self.stage=0
 
+  def step(self):
+    motor=self.motor
+    self.stage+=1
+    if self.stage==1:
+      if motor.busy: return None
+      motor.busy=True
+      motor.log._='Pressing key preparation'
+      return 0.25
+    elif self.stage==2:
+      motor.log._='Pressing key preparation complete'
+      return 0.05
+    elif self.stage==3:
+      motor.log._='Pressing key initiation complete'
+      return 0.1
+    elif self.stage==4:
+      motor.log._='Actually pressing the key'
+      motor.parent.parent.key_pressed(self.key)
+      motor.log._='Finishing movement'
+      return 0.15
+    motor.log._='Finished movement'
+    motor.busy=False
+    return None
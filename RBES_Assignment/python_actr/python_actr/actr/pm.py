@@ -1,14 +1,25 @@
 import python_actr
 import math
-import collections
+
+try:
+  import numpy
+except ImportError:
+  numpy=None
 
 __all__=['ProceduralSubModule','PMNoise','PMPGC',
          'PMPGCSuccessWeighted','PMPGCMixedWeighted',
          'PMTD','PMNew']
 
 class ProceduralSubModule(python_actr.Model):
+  # True if utility() only changes when the adaptor says so with changed()
+  # (so the ACT-R model can keep the utilities it gets), False if it has
+  # to be asked every time
+  _cacheable=False
   def start(self):
     self.parent.add_adaptor(self)
+  def changed(self,prod=None):
+    # the utility of prod (or of every production) may have changed
+    self.parent.utility_changed(prod)
   def create(self,prod):
     pass
   def firing(self,prod):
@@ -19,6 +30,9 @@ class ProceduralSubModule(python_actr.Model):
     pass
   def utility(self,prod):
     return 0      
+  def utilities(self,prods):
+    # utility() of each of prods as a numpy array
+    return numpy.fromiter((self.utility(p) for p in prods),float,len(prods))
   def below_threshold(self):
     pass  
        
@@ -27,15 +41,28 @@ class PMNoise(ProceduralSubModule):
   def __init__(self,noise=0,baseNoise=0.0):
     self.noise=noise
     self.baseNoise=baseNoise
+    self._generator=None
   def create(self,prod,parents=None):
     prod.baseNoise=self.logisticNoise(self.baseNoise)
+    self.changed(prod)
   def utility(self,prod):
     return prod.baseNoise+self.logisticNoise(self.noise)
+  def utilities(self,prods):
+    base=numpy.fromiter((p.baseNoise for p in prods),float,len(prods))
+    return base+self.logisticNoises(self.noise,len(prods))
   def logisticNoise(self,s):
     x=self.random.random()
     return s*math.log(1.0/x -1.0)
+  def logisticNoises(self,s,n):
+    # n values from the same distribution as logisticNoise, drawn at once by
+    # a numpy generator seeded from the model's random number generator
+    if self._generator is None:
+      self._generator=numpy.random.default_rng(self.random.getrandbits(64))
+    x=self._generator.random(n)
+    return s*numpy.log(1.0/x -1.0)
     
 class PMPGC(ProceduralSubModule):
+  _cacheable=True
   def __init__(self,goal=20):
     self.history=[]
     self.goal=goal
@@ -45,8 +72,9 @@ class PMPGC(ProceduralSubModule):
     prod.successes=1
     prod.failures=0
     prod.time=self.parent.production_time
-    if isinstance(prod.time, collections.Callable): prod.time=prod.time()
+    if callable(prod.time): prod.time=prod.time()
     prod.lock_pgc=False
+    self.changed(prod)
   def selecting(self,prod):
     if self._clearFlag:
       del self.history[:]
@@ -61,11 +89,20 @@ class PMPGC(ProceduralSubModule):
           if value>=0: p.successes+=value
           else: p.failures-=value
     self._clearFlag=True  
+    self.changed()
   def utility(self,prod):
     p=prod.successes/(prod.successes+prod.failures)
     c=prod.time/(prod.successes+prod.failures)
     g=self.goal
     return p*g-c
+  def utilities(self,prods):
+    s,f,t=self._arrays(prods)
+    return s/(s+f)*self.goal-t/(s+f)
+  def _arrays(self,prods):
+    n=len(prods)
+    return (numpy.fromiter((p.successes for p in prods),float,n),
+            numpy.fromiter((p.failures for p in prods),float,n),
+            numpy.fromiter((p.time for p in prods),float,n))
   def set(self,prod,successes=None,failures=None,time=None,lock=None):
     if not isinstance(prod,Production):
         prod=self.parent._productions[prod]
@@ -73,6 +110,7 @@ class PMPGC(ProceduralSubModule):
     if failures is not None: prod.failures=failures
     if time is not None: prod.time=time
     if lock is not None: prod.lock_pgc=lock
+    self.changed(prod)
     
     
       
@@ -83,16 +121,23 @@ class PMPGCSuccessWeighted(PMPGC):
     c=prod.time/(prod.successes)
     g=self.goal
     return p*g-c
+  def utilities(self,prods):
+    s,f,t=self._arrays(prods)
+    return 1.0*self.goal-t/s
 class PMPGCMixedWeighted(PMPGC):
   def utility(self,prod):
     p=prod.successes/(prod.successes+prod.failures)
     c=prod.time/(prod.successes)
     g=self.goal
     return p*g-c
+  def utilities(self,prods):
+    s,f,t=self._arrays(prods)
+    return s/(s+f)*self.goal-t/s
   
 
 # From (Fu & Anderson, 2004)
 class PMTD(ProceduralSubModule):
+    _cacheable=True
     def __init__(self,alpha=0.1,discount=1,cost=0.05):
         self.alpha=alpha
         self.discount=discount
@@ -103,6 +148,7 @@ class PMTD(ProceduralSubModule):
     def create(self,prod,parents=None):
         prod.td_u=0
         prod.cost=self.cost
+        self.changed(prod)
     def firing(self,prod):
         if self.last_prod is not None:
             d=self.now()-self.last_time
@@ -110,6 +156,7 @@ class PMTD(ProceduralSubModule):
             r=self.this_reward-self.last_prod.cost+prod.td_u/(1+k*d)
             td=r-self.last_prod.td_u
             self.last_prod.td_u+=self.alpha*td
+            self.changed(self.last_prod)
         self.last_prod=prod
         self.last_time=self.now()
         self.this_reward=0
@@ -120,17 +167,22 @@ class PMTD(ProceduralSubModule):
     def utility(self,prod):
         return prod.td_u
 
+    def utilities(self,prods):
+        return numpy.fromiter((p.td_u for p in prods),float,len(prods))
+
 
 
        
                        
 class PMNew(ProceduralSubModule):
+  _cacheable=True
   def __init__(self,alpha=0.2):
     self.history=[]
     self.alpha=alpha
     self.clearFlag=False
   def create(self,prod,parents=None):
     prod.util=0
+    self.changed(prod)
   def selecting(self,prod):
     if self.clearFlag:
       del self.history[:]
@@ -143,6 +195,9 @@ class PMNew(ProceduralSubModule):
       r=value-dt
       p.util+=self.alpha*(r-p.util)
     self.clearFlag=True  
+    self.changed()
   def utility(self,prod):
     return prod.util
+  def utilities(self,prods):
+    return numpy.fromiter((p.util for p in prods),float,len(prods))
             
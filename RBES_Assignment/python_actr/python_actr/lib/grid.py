@@ -2,10 +2,21 @@ import python_actr
 import math
 
 from . import cellular
+from python_actr.scheduler import Process
 
 Cell = cellular.Cell
 
 
+class WorldClock(Process):
+	def __init__(self, world):
+		self.world = world
+
+	def step(self):
+		self.world.update()
+		self.world._update_time = self.world.now()
+		return self.world.rate
+
+
 class World(cellular.World, python_actr.Model):
 	rate = 1
 	fade_time = 0.5
@@ -16,10 +27,7 @@ class World(cellular.World, python_actr.Model):
 		python_actr.Model.__init__(self, **keys)
 
 	def start(self):
-		while True:
-			self.update()
-			self._update_time = self.now()
-			yield self.rate
+		return WorldClock(self)
 
 	def add(self, agent, *arg, **args):
 		if isinstance(agent, python_actr.Model):
@@ -139,6 +139,10 @@ class Log:
         self.data={}
         self.time=0
         self.id='%08x'%int(random.randrange(0x7FFFFFFF))
+
+    def __deepcopy__(self,memo):
+        # copies of a model (see Model.snapshot) keep logging to the same place
+        return self
   
 
 
@@ -156,6 +160,8 @@ class DummyLog:
     pass
   def __getitem__(self,key):
     return self
+  def __deepcopy__(self,memo):
+    return self
 dummy=DummyLog()    
 
 
@@ -202,6 +208,8 @@ class LogProxy:
   
   def __bool__(self):
     return True
+  def __deepcopy__(self,memo):
+    return self
 
 
 
@@ -247,6 +255,8 @@ def finished(flush=True):
             f.close()
         del pending_output[:]
         log.last_flush=time.time()        
+    from . import profiler
+    profiler.finished()
     log.reset()
     print ("end...")
     
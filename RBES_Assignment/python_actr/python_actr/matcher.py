@@ -0,0 +1,365 @@
+import sys
+import os
+import weakref
+import multiprocessing
+
+from .model import Model
+from . import pattern
+
+
+def _trackable(name,spec):
+    # a spec that only reads slots of the module itself; a dotted slot (such
+    # as 'cell.dirty') reads other objects, whose changes can't be followed
+    if isinstance(spec,(list,tuple)):
+        for s in spec:
+            if not _trackable(name,s): return False
+        return True
+    if spec is None: return True
+    if not isinstance(spec,str): return False
+    funcs,funcs2=pattern.tests({name:spec})
+    for kind,n,key,arg in funcs+funcs2:
+        if isinstance(key,str) and '.' in key: return False
+    return True
+
+def _shareable(test):
+    kind,name,key,arg=test
+    if kind not in ('eq','ne','none'): return False
+    return not (isinstance(key,str) and key.startswith('?'))
+
+_factored=weakref.WeakKeyDictionary()
+
+def factor(production):
+    """Splits the tests of a production into (shared,rest).
+
+    shared are the tests of a single slot against a constant, which other
+    productions are likely to make as well; rest is a Pattern making all
+    the other tests.  This is the same for every instance of a class
+    (compiled productions have no function of their own and are done
+    each time).
+    """
+    func=getattr(production,'original_func',production)
+    factored=_factored.get(func)
+    if factored is None:
+        funcs,funcs2=pattern.tests(production.pattern_specs)
+        shared=[]
+        rest=[]
+        for t in funcs:
+            if _shareable(t):
+                kind,name,key,arg=t
+                if type(arg) is str: arg=sys.intern(arg)
+                shared.append((kind,name,key,arg))
+            else:
+                rest.append(t)
+        factored=_factored[func]=(tuple(shared),pattern.from_tests(rest,funcs2))
+    return factored
+
+class Matcher:
+    """Incremental matching of the productions of a ProductionSystem.
+
+    Productions are indexed by the modules they test.  Every Model counts
+    the changes made to it and its children in _version, so a production
+    only needs to be matched again when one of its modules has changed
+    since the last time.  Productions that test something whose changes
+    can't be followed (a callable pattern, a dotted slot such as
+    'cell.dirty', or an object that isn't a Model) are matched every time,
+    as before.
+
+    Tests of a slot against a constant (such as goal slot 0 being 'count')
+    are shared: each slot is looked up and each test is run at most once
+    after its module changes, and the result is used by every production
+    making it.  deduplicated is the number of tests saved this way.  Each
+    production is also filed under the value one of its slots must have
+    (the slot that tells the most productions apart), so productions whose
+    slot has some other value aren't looked at.
+    """
+    def __init__(self,productions,context):
+        self.productions=productions
+        self.context=context
+        self.indexed=0         # productions[:indexed] are in the index
+        self.order={}          # production -> position in productions
+        self.index={}          # module name -> productions testing it
+        self.versions={}       # module name -> _version when last matched
+        self.always=set()      # productions matched on every cycle
+        self.stale=set()       # productions that must be matched again
+        self.matching=set()
+        self.factored={}       # production -> (shared tests,Pattern for rest)
+        self.keyed={}          # slot -> {value: productions needing it}
+        self.unkeyed={}        # module name -> productions not in keyed
+        self.slots={}          # module name -> keyed slots of its productions
+        self.constants={}      # slot -> constants productions test it against
+        self.tests={}          # module name -> shared tests on it
+        self.values={}         # slot -> value since its module changed
+        self.results={}        # shared test -> result since module changed
+        self.deduplicated=0
+        self.evaluations=0
+
+    def add(self,productions):
+        added=[]
+        for production in productions:
+            self.order[production]=len(self.order)
+            specs=production.pattern_specs
+            for name,spec in specs.items():
+                if not _trackable(name,spec) or not isinstance(self.context.get(name),Model):
+                    self.always.add(production)
+                    break
+            else:
+                shared,rest=self.factored[production]=factor(production)
+                for t in shared:
+                    kind,name,key,arg=t
+                    if kind=='eq':
+                        self.constants.setdefault((name,key),set()).add(arg)
+                    tests=self.tests.setdefault(name,set())
+                    if t in tests: self.deduplicated+=1
+                    else: tests.add(t)
+                for name in specs:
+                    self.index.setdefault(name,set()).add(production)
+                self.stale.add(production)
+                added.append(production)
+        constants=self.constants
+        for production in added:
+            slot=None
+            for kind,name,key,arg in self.factored[production][0]:
+                if kind=='eq' and (slot is None or len(constants[(name,key)])>len(constants[slot])):
+                    slot,value=(name,key),arg
+            if slot is None:
+                for name in production.pattern_specs:
+                    self.unkeyed.setdefault(name,set()).add(production)
+            else:
+                self.keyed.setdefault(slot,{}).setdefault(value,set()).add(production)
+                for name in production.pattern_specs:
+                    self.slots.setdefault(name,set()).add(slot)
+
+    def match(self):
+        productions=self.productions
+        if self.indexed<len(productions):
+            self.add(productions[self.indexed:])
+            self.indexed=len(productions)
+        context=self.context
+        stale=self.stale
+        versions=self.versions
+        matching=self.matching
+        changed=[]
+        for name in self.index:
+            v=context[name]._version
+            if versions.get(name)!=v:
+                versions[name]=v
+                changed.append(name)
+                for t in self.tests.get(name,()):
+                    self.results.pop(t,None)
+                    self.values.pop((name,t[2]),None)
+        for name in changed:
+            stale.update(self.unkeyed.get(name,()))
+            stale.update(matching.intersection(self.index[name]))
+            for slot in self.slots.get(name,()):
+                stale.update(self.keyed[slot].get(self.value(slot),()))
+        stale.update(self.always)
+        self.rematch(stale)
+        self.evaluations+=len(stale)
+        stale.clear()
+        return sorted(matching,key=self.order.__getitem__)
+
+    def rematch(self,stale):
+        matching=self.matching
+        matches=self.matches
+        for p in stale:
+            if matches(p): matching.add(p)
+            else: matching.discard(p)
+
+    def matches(self,p):
+        f=self.factored.get(p)
+        if f is None: return p.match(self.context)
+        shared,rest=f
+        for t in shared:
+            if not self.test(t): return False
+        b=rest.match(self.context)
+        if b is None: return False
+        p.bound=b
+        return True
+
+    def value(self,slot):
+        # the text of a slot, or None if it has none
+        try:
+            return self.values[slot]
+        except KeyError:
+            pass
+        try:
+            v=pattern.get(self.context,slot[0],slot[1])
+        except (AttributeError,TypeError,KeyError):
+            v=None
+        self.values[slot]=v
+        return v
+
+    def test(self,t):
+        r=self.results.get(t)
+        if r is None:
+            kind,name,key,arg=t
+            if kind=='none':
+                try:
+                    x=self.context[name]
+                    r=x==None or len(x)==0
+                except (AttributeError,TypeError,KeyError):
+                    r=False
+            else:
+                v=self.value((name,key))
+                if v is None: r=False
+                elif kind=='eq': r=v==arg
+                else: r=v!=arg
+            self.results[t]=r
+        return r
+
+    def unchanged(self,production):
+        """True if nothing production tests has changed since match().
+
+        The variables it bound then are still right, so it needn't be
+        matched again before it fires.  This is never so for productions
+        matched on every cycle, since their changes can't be followed.
+        """
+        if production in self.always or production not in self.factored or production not in self.matching:
+            return False
+        context=self.context
+        versions=self.versions
+        for name in production.pattern_specs:
+            if versions.get(name)!=context[name]._version: return False
+        return True
+
+
+class Snapshot:
+    """The slot values of a module the productions test, as of one cycle."""
+    def __init__(self,symbols):
+        self._symbols=symbols
+
+_shard={}      # in a worker: index -> production, forked from the parent
+
+def _start_worker(productions):
+    _shard.clear()
+    _shard.update(enumerate(productions))
+
+def _match_shard(args):
+    indices,snapshots=args
+    m=Matcher([],snapshots)
+    result=[]
+    for i in indices:
+        p=_shard[i]
+        m.factored[p]=factor(p)
+        if m.matches(p): result.append((i,p.bound))
+    return result
+
+class ParallelMatcher(Matcher):
+    """A Matcher that matches large rule bases in several processes.
+
+    It is only used by a ProductionSystem that sets _parallel_matching, and
+    is experimental: no speedup has been measured yet (bench_parallel.py
+    runs at 0.7x on one core, and has not been run on several).
+
+    When at least threshold productions must be matched again, those that
+    only test modules by plain slot names are split into one shard per
+    process.  Each worker is forked from the model, so it already has the
+    productions, and is sent a Snapshot of the slots they test.  The
+    bindings of the productions that match are sent back.  Below the
+    threshold (or where fork isn't available) matching is done here, as
+    by Matcher.
+
+    The pool itself cannot be copied, so a copy (see Model.snapshot) starts
+    without one and forks its own the first time it needs it.
+    """
+    threshold=1000
+
+    def __init__(self,productions,context,processes=None):
+        Matcher.__init__(self,productions,context)
+        self.processes=processes or os.cpu_count() or 1
+        self.pool=None
+        self.pooled=0          # productions[:pooled] are known to the pool
+        self.shardable={}      # production -> position in productions
+        self.keys={}           # module name -> slots shardable productions test
+        self.nones=set()       # modules tested for being empty
+        self.snapshots={}      # module name -> (_version,Snapshot)
+        self.parallel=0        # cycles matched in the pool
+
+    def add(self,productions):
+        Matcher.add(self,productions)
+        for production in productions:
+            if production not in self.factored: continue
+            funcs,funcs2=pattern.tests(production.pattern_specs)
+            tests=funcs+funcs2
+            if all(pattern.plain(key) for kind,name,key,arg in tests):
+                self.shardable[production]=self.order[production]
+                for kind,name,key,arg in tests:
+                    if kind=='none': self.nones.add(name)
+                    else: self.keys.setdefault(name,set()).add(key)
+
+    def rematch(self,stale):
+        shardable=[p for p in stale if p in self.shardable]
+        if self.processes<2 or len(shardable)<self.threshold or not self.start():
+            return Matcher.rematch(self,stale)
+        matching=self.matching
+        matches=self.matches
+        for p in stale:
+            if p not in self.shardable:
+                if matches(p): matching.add(p)
+                else: matching.discard(p)
+        snapshots=self.snapshot()
+        n=self.processes
+        order=self.shardable
+        shards=[([order[p] for p in shardable[i::n]],snapshots) for i in range(n)]
+        productions=self.productions
+        for p in shardable: matching.discard(p)
+        for result in self.pool.map(_match_shard,shards):
+            for i,b in result:
+                p=productions[i]
+                p.bound=b
+                matching.add(p)
+        self.parallel+=1
+
+    def start(self):
+        # a pool forked with every production that might be sent to it
+        if self.pool is not None and self.pooled==len(self.productions): return True
+        self.close()
+        try:
+            fork=multiprocessing.get_context('fork')
+        except ValueError:
+            self.processes=1
+            return False
+        self.pooled=len(self.productions)
+        self.pool=fork.Pool(self.processes,_start_worker,(list(self.productions),))
+        self._finalizer=weakref.finalize(self,self.pool.terminate)
+        return True
+
+    def close(self):
+        if self.pool is not None:
+            self._finalizer()
+            self.pool=None
+
+    def __getstate__(self):
+        state=self.__dict__.copy()
+        state['pool']=None
+        state['pooled']=0
+        state.pop('_finalizer',None)
+        return state
+
+    def snapshot(self):
+        context=self.context
+        snapshots={}
+        for name in set(self.keys)|self.nones:
+            x=context[name]
+            version=getattr(x,'_version',None)
+            old=self.snapshots.get(name)
+            if old is not None and old[0]==version:
+                snapshots[name]=old[1]
+                continue
+            try:
+                empty=x==None or len(x)==0
+            except (AttributeError,TypeError,KeyError):
+                empty=False
+            if empty:
+                s=None
+            else:
+                symbols={}
+                for key in self.keys.get(name,()):
+                    try:
+                        symbols[key]=pattern.get(context,name,key)
+                    except (AttributeError,TypeError,KeyError):
+                        pass
+                s=Snapshot(symbols)
+            self.snapshots[name]=(version,s)
+            snapshots[name]=s
+        return snapshots
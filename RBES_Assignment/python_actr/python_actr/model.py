@@ -5,6 +5,8 @@ from . import logger
 import random
 import inspect      
 import copy
+import weakref
+import types
 #import ccm.config as config
 
 class MethodWrapper:
@@ -16,21 +18,62 @@ class MethodWrapper:
       self.ends=scheduler.Trigger(name+' end')
       self.default_trigger=self.ends
   def __call__(self,*args,**keys):
-      self.obj.sch.trigger(self.begins)
+      sch=self.obj.sch
+      if self.begins in sch.triggers: sch.trigger(self.begins)
       val=self.func(self.obj,*args,**keys)
-      self.obj.sch.trigger(self.ends)
+      if isinstance(val,scheduler.Process):
+          return sch.add(MethodProcess(self,val))
+      if self.ends in sch.triggers: sch.trigger(self.ends)
       return val
 class MethodGeneratorWrapper(MethodWrapper):
   def _generator(self,*args,**keys):
-      self.obj.sch.trigger(self.begins)
-      for x in self.func(self.obj,*args,**keys):
-          yield x
-      self.obj.sch.trigger(self.ends)
+      sch=self.obj.sch
+      if self.begins in sch.triggers: sch.trigger(self.begins)
+      yield from self.func(self.obj,*args,**keys)
+      if self.ends in sch.triggers: sch.trigger(self.ends)
   def __call__(self,*args,**keys):
       return self.obj.sch.add(self._generator,args=args,keys=keys)
   def __str__(self):
       return '<MGW %s %s>'%(self.obj,self.__name__)    
 
+class MethodProcess(scheduler.Process):
+  # runs a scheduler.Process returned by a method, then triggers its end
+  def __init__(self,wrapper,process):
+      self.wrapper=wrapper
+      self.process=process
+  def step(self):
+      result=self.process.step()
+      if result is None:
+          self.wrapper.obj.sch.trigger(self.wrapper.ends)
+      return result
+
+class Snapshot:
+  """A frozen copy of a whole model tree, taken between events.
+
+  restore() returns a fresh, independent copy of the model each time it is
+  called, so many runs can branch from the same warmed-up state.  Processes
+  still running as generators cannot be copied; write them as
+  scheduler.Process objects instead.
+  """
+  def __init__(self,model):
+      root=model
+      while root.parent is not None: root=root.parent
+      waiting=root.sch.generator_events()
+      if waiting:
+          names=sorted(set(_process_name(e) for e in waiting))
+          raise scheduler.SchedulerError('Cannot snapshot generator processes: %s'%', '.join(names))
+      self.time=root.sch.time
+      self._state=copy.deepcopy((root,model))
+  def restore(self):
+      return copy.deepcopy(self._state)[1]
+
+def _process_name(event):
+  g=event.func.__self__
+  w=g.gi_frame.f_locals.get('self') if g.gi_frame is not None else None
+  if isinstance(w,MethodWrapper):
+      return '%s.%s'%(w.obj.__class__.__name__,w.__name__)
+  return g.__qualname__
+
 def log_everything(model,log=None):
   if log is None: log=logger.log_proxy
   if not hasattr(model,'log'): model.run(limit=0)
@@ -42,10 +85,57 @@ def log_everything(model,log=None):
         log_everything(v,getattr(log,k))
 
 
+def unwrapped(func):
+  """Marks a Model method to be called directly instead of through a
+  MethodWrapper.  Calls are cheaper, but nothing can wait for the method's
+  begin or end, so use it for small methods that are called constantly."""
+  func._unwrapped=True
+  return func
+
+_class_info=weakref.WeakKeyDictionary()
+_immutable=(type(None),bool,int,float,complex,str,bytes,type,types.FunctionType,types.BuiltinFunctionType)
+
+def _conversion_info(cls):
+  # the methods of a Model class, found once per class rather than once per
+  # instance
+  info=_class_info.get(cls)
+  if info is not None: return info
+  methods={}
+  for klass in inspect.getmro(cls)[:-1]:
+      if klass is not Model:
+          for k,v in inspect.getmembers(klass,inspect.isfunction):
+              if k[0]!='_' and k not in ['run','now','get_children','snapshot'] and k not in methods:
+                  methods[k]=v
+  generators=set(k for k,v in methods.items() if v.__code__.co_flags&0x20==0x20)
+  wrapped=[k for k,v in methods.items() if not getattr(v,'_unwrapped',False)]
+  info=_class_info[cls]=(methods,wrapped,generators)
+  return info
+
+def _class_objects(cls):
+  # the class-level values of a Model class, read again for each instance
+  # so that changes to the class take effect; immutable values are shared
+  # and the rest is copied
+  shared={}
+  objects={}
+  if cls is Model: return shared,objects
+  for k in dir(cls):
+      if k[0]!='_':
+          v=getattr(cls,k)
+          if inspect.isfunction(v): continue
+          if isinstance(v,_immutable) and not (inspect.isclass(v) and Model in inspect.getmro(v)):
+              shared[k]=v
+          else:
+              objects[k]=v
+  return shared,objects
+
 class Model:
     __converted=False
     _convert_methods=True
     _auto_run_start=True
+    _scheduler_queue='heap'
+    _random_seed=None
+    _version=0                 # counts changes to this model and its children
+    _symbols=None              # see pattern.symbol; Buffer shows its chunk's
     name='top'
     
     def __init__(self,log=None,**keys):
@@ -66,21 +156,12 @@ class Model:
         
         if hasattr(self,'parent'): parent=self.parent
         
-        methods={}
-        objects={}
-        for klass in inspect.getmro(self.__class__)[:-1]:
-            if klass is not Model:
-                for k,v in inspect.getmembers(klass):
-                    if k[0]!='_':
-                        if inspect.isfunction(v):
-                            if k not in ['run','now','get_children'] and k not in methods and klass is not Model:
-                                methods[k]=v
-                        else:
-                            if inspect.isclass(v) and Model in inspect.getmro(v):
-                                v=v()
-                            if k not in objects:
-                                objects[k]=v
+        methods,wrapped,generators=_conversion_info(self.__class__)
+        shared,objects=_class_objects(self.__class__)
+        for k,v in objects.items():
+            if inspect.isclass(v): objects[k]=v()     # a Model class; each instance gets its own
         objects=copy.deepcopy(objects)
+        objects.update(shared)
         
         if parent:
             if not parent.__converted: parent.__convert()
@@ -89,16 +170,14 @@ class Model:
             self.random=parent.random
             self.parent=parent
         else:
-            self.sch=scheduler.Scheduler()
+            self.sch=scheduler.Scheduler(self._scheduler_queue)
             if self.__init_log is True:
                 self.log=logger.log()
             elif self.__init_log is None:
                 self.log=logger.dummy   
             else:
                 self.log=self.__init_log    
-            self.random=random.Random() 
-            #seed=config.getOptions().random
-            #if seed is not None: self.random.seed(seed)
+            self.random=random.Random(self._random_seed) 
             
             self.parent=None   
         
@@ -119,8 +198,9 @@ class Model:
 
         
         if self._convert_methods:    
-          for name,func in list(methods.items()):
-              if func.__code__.co_flags&0x20==0x20:
+          for name in wrapped:
+              func=methods[name]
+              if name in generators:
                   w=MethodGeneratorWrapper(self,func,name)
               else:
                   w=MethodWrapper(self,func,name)
@@ -169,6 +249,7 @@ class Model:
           m=self
           done=[]
           while m is not None:
+            m.__dict__['_version']=m._version+1
             self.sch.trigger(m.changes,priority=-1)
             done.append(m)
             m=m.parent
@@ -195,6 +276,9 @@ class Model:
         if func is not None:
             self.sch.add(func)
         self.sch.run()
+    def snapshot(self):
+        self._ensure_converted()
+        return Snapshot(self)
     def stop(self):
         if not self.__converted:
             self.__convert()
@@ -0,0 +1,33 @@
+import concurrent.futures
+
+def seed_for(seed,index):
+    """The deterministic Model.random seed of replication `index`."""
+    if seed is None: return None
+    return '%s-%d'%(seed,index)
+
+def _seed(model,seed):
+    if seed is None: return
+    if model._is_converted():
+        raise ValueError('Cannot seed a model that has already been run')
+    model._random_seed=seed
+
+def _run_replication(factory,seed,limit,collect):
+    model=factory()
+    _seed(model,seed)
+    model.run(limit=limit)
+    if collect is None: return None
+    return collect(model)
+
+def run_replications(factory,count,limit=None,seed=None,collect=None,processes=None):
+    """Builds `count` models with `factory` and runs them in a process pool.
+
+    `factory` and `collect` must be picklable (e.g. module-level classes or
+    functions), and with a `seed` the factory must return a model that has
+    not been run yet.  Model i has its Model.random seeded from
+    seed_for(seed,i), so any replication can be run again on its own, and
+    the collected results are returned in order.
+    """
+    with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+        futures=[pool.submit(_run_replication,factory,seed_for(seed,i),limit,collect)
+                 for i in range(count)]
+        return [f.result() for f in futures]
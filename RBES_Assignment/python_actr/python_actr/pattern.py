@@ -1,4 +1,5 @@
 import re
+import sys
 import typing
 
 class PatternException(Exception):
@@ -17,6 +18,8 @@ def get(obj,name,key):
       except (AttributeError, TypeError):
         a=getattr(a,key1)
 
+  symbols=getattr(a,'_symbols',None)
+  if symbols is not None: return symbols[key]
   try:
       x=a[key]
   except AttributeError:  
@@ -26,6 +29,18 @@ def get(obj,name,key):
 
   return x
 
+def symbol(value):
+  """The text patterns compare a slot value with, interned.
+
+  Chunks keep the symbols of their slots in _symbols (and buffers show the
+  symbols of their chunk), so matching them needs no formatting, and equal
+  symbols are the same object, which makes comparing them cheap.
+  """
+  if isinstance(value,float): value='%g'%value
+  elif not isinstance(value,str): value=repr(value)
+  if type(value) is str: value=sys.intern(value)
+  return value
+
 def partialmatch(obj,name,key,b,value):
   if type(key)==str and key[0]=='?':
       key=b[key[1:]]
@@ -47,11 +62,38 @@ def partialmatch(obj,name,key,b,value):
 
 
 class Pattern:
+    compile_after=16    # interpreted matches before a pattern is compiled
     def __init__(self,patterns,bound=None,partial=None):
-        self.funcs=parse(patterns,bound)
+        self._setup(tests(patterns,bound),partial)
+
+    def _setup(self,tests,partial):
+        funcs,funcs2=tests
+        self.funcs=interpret(funcs,funcs2)
         self.partial=partial
+        self.compiled=None
+        self.uses=0
+        if partial is None and compilable(funcs,funcs2):
+            self._tests=funcs,funcs2
+            factory=_compiled.get(shape(funcs,funcs2))
+            if factory is not None: self.compile()
+        else:
+            self._tests=None
         
     def match(self,obj):
+        compiled=self.compiled
+        if compiled is not None:
+            b={}
+            try:
+                if compiled(obj,b): return b
+            except (AttributeError,TypeError,KeyError) as e:
+                pass
+            return None
+        if self._tests is not None:
+            self.uses+=1
+            if self.uses>=self.compile_after:
+                self.compile()
+                return self.match(obj)
+
         b={}
         b['_partial']=self.partial
         if self.partial is not None:
@@ -65,12 +107,31 @@ class Pattern:
             return None
         del b['_partial']
         return b    
+
+    def compile(self):
+        funcs,funcs2=self._tests
+        key=shape(funcs,funcs2)
+        factory=_compiled.get(key)
+        if factory is None:
+            factory=_compiled[key]=compile_pattern(funcs,funcs2)
+        self.compiled=factory(constants(funcs,funcs2))
+
+def from_tests(funcs,funcs2):
+    """A Pattern making the given tests, as returned by tests()."""
+    p=Pattern.__new__(Pattern)
+    p._setup((funcs,funcs2),None)
+    return p
             
 
 
         
         
-def parse(patterns,bound=None):
+def tests(patterns,bound=None):
+    """The tests a pattern makes, as (kind,name,key,arg) tuples.
+
+    The first list is run first; its tests only need slot values.  The
+    second holds the tests that need the variables bound by the first.
+    """
     if not hasattr(patterns,'items'):
       patterns={None:patterns} 
     funcs=[]
@@ -80,16 +141,9 @@ def parse(patterns,bound=None):
         if not isinstance(pattern,(list,tuple)): pattern=[pattern]
         for p in pattern:
             if p is None:
-                if name is None: funcs.append(lambda x,b: x==None)
-                else:            funcs.append(lambda x,b,name=name: x[name]==None or len(x[name])==0)
+                funcs.append(('none',name,None,None))
             elif callable(p):
-                if name is None:
-                  def callfunc(x,b,name=name,p=p):
-                    return p(x,b)
-                else:
-                  def callfunc(x,b,name=name,p=p):
-                    return p(x[name],b)
-                funcs2.append(callfunc)        
+                funcs2.append(('call',name,None,p))
             elif isinstance(p,str):
                 namedSlots=False
                 for j,text in enumerate(p.split()):
@@ -113,15 +167,13 @@ def parse(patterns,bound=None):
                         m=re.match('([\w\.-]+)',text)
                         if m!=None:
                             text=text[m.end():]
-                            t=m.group(1)
-                            funcs.append(lambda x,b,name=name,key=key,t=t: partialmatch(x,name,key,b,t))
+                            funcs.append(('eq',name,key,m.group(1)))
                             continue
 
                         m=re.match('!([\w\.-]+)',text)
                         if m!=None:
                             text=text[m.end():]
-                            t=m.group(1)
-                            funcs.append(lambda x,b,name=name,key=key,t=t: get(x,name,key)!=t)
+                            funcs.append(('ne',name,key,m.group(1)))
                             continue
         
                         m=re.match('\?(\w+)',text)
@@ -129,15 +181,12 @@ def parse(patterns,bound=None):
                             text=text[m.end():]
                             v=m.group(1)
                             if bound is not None and v in bound:
-                                funcs.append(lambda x,b,name=name,key=key,t=bound[v]: partialmatch(x,name,key,b,t))
+                                funcs.append(('eq',name,key,bound[v]))
                             elif v in vars:
-                                funcs2.append(lambda x,b,name=name,key=key,v=v: partialmatch(x,name,key,b,b[v]))
+                                funcs2.append(('eqvar',name,key,v))
                             else:    
                                 vars[v]=(name,key)
-                                def setfunc(x,b,name=name,key=key,v=v):
-                                  b[v]=get(x,name,key)
-                                  return True
-                                funcs.append(setfunc)
+                                funcs.append(('set',name,key,v))
                             continue
         
                         m=re.match('!\?(\w+)',text)
@@ -145,16 +194,146 @@ def parse(patterns,bound=None):
                             text=text[m.end():]
                             v=m.group(1)
                             if bound is not None and v in bound:
-                                funcs.append(lambda x,b,name=name,key=key,t=bound[v]: get(x,name,key)!=t)
+                                funcs.append(('ne',name,key,bound[v]))
                             else:
-                                funcs2.append(lambda x,b,name=name,key=key,v=v: get(x,name,key)!=b[v])
+                                funcs2.append(('nevar',name,key,v))
                             continue
 
                         raise PatternException("Unknown text '%s' in pattern '%s'"%(text,pattern))  
-    return funcs+funcs2                        
-        
+    return funcs,funcs2
 
-        
-        
-        
-        
+def parse(patterns,bound=None):
+    return interpret(*tests(patterns,bound))
+
+def interpret(funcs,funcs2):
+    result=[]
+    for kind,name,key,arg in funcs+funcs2:
+        if kind=='none':
+            if name is None: result.append(lambda x,b: x==None)
+            else:            result.append(lambda x,b,name=name: x[name]==None or len(x[name])==0)
+        elif kind=='call':
+            if name is None:
+              def callfunc(x,b,name=name,p=arg):
+                return p(x,b)
+            else:
+              def callfunc(x,b,name=name,p=arg):
+                return p(x[name],b)
+            result.append(callfunc)
+        elif kind=='eq':
+            result.append(lambda x,b,name=name,key=key,t=arg: partialmatch(x,name,key,b,t))
+        elif kind=='ne':
+            result.append(lambda x,b,name=name,key=key,t=arg: get(x,name,key)!=t)
+        elif kind=='set':
+            def setfunc(x,b,name=name,key=key,v=arg):
+              b[v]=get(x,name,key)
+              return True
+            result.append(setfunc)
+        elif kind=='eqvar':
+            result.append(lambda x,b,name=name,key=key,v=arg: partialmatch(x,name,key,b,b[v]))
+        elif kind=='nevar':
+            result.append(lambda x,b,name=name,key=key,v=arg: get(x,name,key)!=b[v])
+    return result
+
+
+# Compiled patterns.  Patterns with the same shape (the same tests on the
+# same slots, whatever the constants) share one compiled function, and the
+# constants are passed in when it is used.
+
+_compiled={}
+_phase={'none':0,'eq':1,'ne':1,'set':2}
+
+def ordered(funcs,funcs2):
+    # cheap tests on constants first, then bindings, then everything that
+    # depends on bindings (in the original order)
+    return sorted(funcs,key=lambda t:_phase[t[0]])+funcs2
+
+def shape(funcs,funcs2):
+    return tuple((kind,name,key,None if kind in ('eq','ne','call') else arg)
+                 for kind,name,key,arg in ordered(funcs,funcs2))
+
+def constants(funcs,funcs2):
+    return [sys.intern(arg) if type(arg) is str else arg
+            for kind,name,key,arg in ordered(funcs,funcs2) if kind in ('eq','ne','call')]
+
+def plain(key):
+    # a slot named directly, rather than by a variable or a dotted path
+    return not (isinstance(key,str) and (key.startswith('?') or '.' in key))
+
+def compilable(funcs,funcs2):
+    # slot names taken from variables are looked up while matching
+    for kind,name,key,arg in funcs+funcs2:
+        if isinstance(key,str) and key.startswith('?'): return False
+    return True
+
+def _text(x):
+    if isinstance(x,float): return '%g'%x
+    if not isinstance(x,str): return repr(x)
+    return x
+
+def compile_pattern(funcs,funcs2):
+    """Compiles the tests of a pattern into a single function.
+
+    Returns a factory which takes the constants of the pattern and returns
+    f(obj,b).  That does the same as running the functions from interpret()
+    in turn: it returns False (or raises) if obj doesn't match, and otherwise
+    fills in b and returns True.  Each object and slot is looked up once and
+    dotted keys are split in advance.
+    """
+    names={}      # name -> local holding x[name]
+    values={}     # (name,key) -> local holding the slot value as text
+    lines=[]
+    def obj(name):
+        if name is None: return 'x'
+        if name not in names:
+            names[name]='o%d'%len(names)
+            lines.append('%s=x[%r]'%(names[name],name))
+        return names[name]
+    def value(name,key):
+        if (name,key) not in values:
+            a=obj(name)
+            path=key.split('.') if isinstance(key,str) else [key]
+            for k in path[:-1]:
+                n='a%d'%len(lines)
+                lines.append('try: %s=%s[%r]'%(n,a,k))
+                lines.append('except (AttributeError,TypeError): %s=getattr(%s,%r)'%(n,a,k))
+                a=n
+            v='v%d'%len(values)
+            lines.append('s=getattr(%s,"_symbols",None)'%a)
+            lines.append('if s is not None: %s=s[%r]'%(v,path[-1]))
+            lines.append('else:')
+            lines.append(' try: %s=%s[%r]'%(v,a,path[-1]))
+            lines.append(' except AttributeError: %s=getattr(%s,%r)'%(v,a,path[-1]))
+            lines.append(' if %s.__class__ is not str: %s=_text(%s)'%(v,v,v))
+            values[(name,key)]=v
+        return values[(name,key)]
+
+    count=0
+    for kind,name,key,arg in ordered(funcs,funcs2):
+        if kind in ('eq','ne','call'):
+            c='c%d'%count
+            count+=1
+        if kind=='none':
+            if name is None: lines.append('if not (x==None): return False')
+            else: lines.append('if not (%s==None or len(%s)==0): return False'%(obj(name),obj(name)))
+        elif kind=='eq':
+            lines.append('if %s!=%s: return False'%(value(name,key),c))
+        elif kind=='ne':
+            lines.append('if %s==%s: return False'%(value(name,key),c))
+        elif kind=='set':
+            lines.append('b[%r]=%s'%(arg,value(name,key)))
+        elif kind=='call':
+            lines.append('if %s(%s,b)==False: return False'%(c,obj(name)))
+        elif kind=='eqvar':
+            lines.append('if %s!=b[%r]: return False'%(value(name,key),arg))
+        elif kind=='nevar':
+            lines.append('if %s==b[%r]: return False'%(value(name,key),arg))
+    lines.append('return True')
+
+    source=['def factory(c):']
+    if count: source.append(' %s=c'%''.join('c%d,'%i for i in range(count)))
+    source.append(' def match(x,b):')
+    source.extend('  '+line for line in lines)
+    source.append(' return match')
+    namespace={'_text':_text}
+    exec(compile('\n'.join(source),'<pattern>','exec'),namespace)
+    return namespace['factory']
@@ -1,8 +1,15 @@
 
 
 from . import model
+from . import scheduler
+from .matcher import Matcher,ParallelMatcher
+from .profiler import ProfilingMatcher
+import ast
+import builtins
 import inspect
 import re
+import types
+import weakref
 from . import pattern
 
 try:
@@ -13,30 +20,112 @@ except:
 class ProductionException(Exception):
     pass
 
+_argspecs=weakref.WeakKeyDictionary()
+
+def getargspec(func):
+    # inspect.getargspec is slow and every instance of a class asks again
+    spec=_argspecs.get(func)
+    if spec is None:
+        spec=_argspecs[func]=inspect.getargspec(func)
+    return spec
+
+_parsed=weakref.WeakKeyDictionary()
+
+def parse_production(name,func):
+    """Returns (keys,base_utility,pattern_specs,pattern,code,compiled code,
+    variables).
+
+    This is the same for every instance of a class, so it is only worked
+    out once per function.
+    """
+    parsed=_parsed.get(func)
+    if parsed is not None: return parsed
+    a,va,hk,d=getargspec(func)
+    a=list(a)
+    base_utility=0
+    patterns={}
+    for i,arg in enumerate(a[:]):
+      if arg=='utility': 
+        base_utility=d[i]
+        del a[i]
+      else:
+        patterns[arg]=d[i]
+    code=inspect.getsource(func)
+    m=re.match(r'[^(]+\([^(]*\):',code)
+    body=code[m.end():]
+    compiled=compile('if True:'+body,'<production-%s>'%name,'exec')
+    parsed=_parsed[func]=(a,base_utility,patterns,pattern.Pattern(patterns),body,compiled,variables(patterns))
+    return parsed
+
+def variables(patterns):
+    # the names of the variables a match binds
+    return frozenset(arg for kind,name,key,arg in pattern.tests(patterns)[0] if kind=='set')
+
+_analysed={}
+_factories={}
+
+def analyse(code):
+    """Returns the names the body of a production reads.
+
+    Returns None if the body assigns to any names: exec() puts those in the
+    bound variables (where requests like goal.set('?x') and production
+    compilation look for them), which a function wouldn't do.
+    """
+    if code in _analysed: return _analysed[code]
+    tree=ast.parse('def fire():\n pass\n')
+    tree.body[0].body=ast.parse('if True:'+code).body[0].body
+    fire=_function(compile(ast.fix_missing_locations(tree),'<production>','exec'))
+    names=None
+    if not fire.co_varnames and not fire.co_cellvars:
+        nodes=list(ast.walk(tree))
+        if not any(isinstance(n,ast.Global) for n in nodes):
+            names=set(n.id for n in nodes if isinstance(n,ast.Name) and isinstance(n.ctx,ast.Load))
+            if names&set(['fire','_bound']): names=None
+    _analysed[code]=names
+    return names
+
+def _function(code):
+    # the code of the function defined by a compiled module
+    for c in code.co_consts:
+        if isinstance(c,types.CodeType): return c
+
+def make_action(name,code,variables,context):
+    """Compiles the body of a production into a function f(bound).
+
+    The modules and other values the body uses are taken from the context
+    now and kept as closure cells, and the variables it uses are read from
+    bound into locals, so firing doesn't look anything up by name.  Names
+    the body reads that are in neither are looked up in the context, as
+    exec() does.  Returns None if the body has to be run with exec().
+    """
+    names=analyse(code)
+    if names is None: return None
+    args=sorted(n for n in names if n in variables)
+    cells=sorted(n for n in names if n not in variables and n in context)
+    key=code,tuple(args),tuple(cells)
+    factory=_factories.get(key)
+    if factory is None:
+        source=['def factory(%s):'%','.join(cells),
+                ' def fire(_bound):']
+        source.extend('  %s=_bound[%r]'%(a,a) for a in args)
+        source.extend(['  pass',' return fire'])
+        tree=ast.parse('\n'.join(source))
+        fire=tree.body[0].body[0]
+        fire.body[-1:]=ast.parse('if True:'+code).body[0].body
+        factory=_factories[key]=_function(compile(ast.fix_missing_locations(tree),'<production-%s>'%name,'exec'))
+    context.setdefault('__builtins__',builtins.__dict__)
+    return types.FunctionType(factory,context)(*[context[c] for c in cells])
+
 class Production:
     def __init__(self,system,name,func):
         self.system=system
         self.name=name
-        self.base_utility=0
-        a,va,hk,d=inspect.getargspec(func)
-        self.keys=a
-        patterns={}
-        for i,name in enumerate(a[:]):
-          if name=='utility': 
-            self.base_utility=d[i]
-            del a[i]
-          else:
-            patterns[name]=d[i]
-        self.pattern_specs=patterns
-        self.pattern=pattern.Pattern(patterns)
+        a,self.base_utility,self.pattern_specs,self.pattern,self.code,self.func,self.variables=parse_production(name,func)
+        self.keys=list(a)
         self.bound=None
-        
         self.original_func=func
-        code=inspect.getsource(func)
-        m=re.match(r'[^(]+\([^(]*\):',code)
-        self.code=code[m.end():]
-        code='if True:'+code[m.end():]
-        self.func=compile(code,'<production-%s>'%self.name,'exec')
+        self.action=None
+        self.action_context=None
         
     def match(self,obj):
         b=self.pattern.match(obj)
@@ -44,21 +133,81 @@ class Production:
         self.bound=b
         return True
     
+    def __getstate__(self):
+        # the action holds on to the modules it was bound to, so a copy of
+        # the production has to bind its own
+        state=dict(self.__dict__)
+        state['action']=None
+        state['action_context']=None
+        return state
+
+    def bind(self,context):
+        self.action=make_action(self.name,self.code,self.variables,context)
+        self.action_context=context
+
     def fire(self,context):
-        self.system.sch.bound=self.bound
-        exec(self.func, context,self.bound)
+        if self.action_context is not context: self.bind(context)
+        if self.action is None:
+            # the names the body assigns go into a copy, so that firing
+            # again without being matched again starts from the same place
+            bound=self.bound
+            if bound is not None: bound=dict(bound)
+            self.system.sch.bound=bound
+            exec(self.func, context,bound)
+        else:
+            self.system.sch.bound=self.bound
+            self.action(self.bound)
             
       
+class ProductionCycle(scheduler.Process):
+    """The match/select/fire loop of a ProductionSystem.
+
+    state is where the loop resumes: 'start', 'cycle' (top of the loop),
+    'match' (after the match delay) or 'fire' (after the production time).
+    """
+    def __init__(self,system):
+        self.system=system
+        self.state='start'
+        self.choice=None
+    def step(self):
+        s=self.system
+        if self.state=='start':
+            s._calc_context()
+            for i in s._initializers:
+                i.fire(s._context)
+            self.state='cycle'
+        elif self.state=='fire':
+            s.log.production=None
+            if s._profile is None: self.choice.fire(s._context)
+            else: s._profile.fire(self.choice,s._context)
+            self.choice=None
+            self.state='cycle'
+        if self.state=='cycle' and s.production_match_delay>0:
+            self.state='match'
+            return s.production_match_delay
+        match=s._matcher.match()
+        if len(match)==0:
+            self.state='cycle'
+            return s._top.changes
+        self.choice=s.random.choice(match)
+        s.log.production=self.choice.name
+        self.state='fire'
+        return s.production_time-s.production_match_delay
+
+
 class ProductionSystem(model.Model):
     production_time=0.05
     production_match_delay=0
+    _production_cycle=ProductionCycle
+    _profile=None          # see profiler.profile_productions
+    _parallel_matching=None  # processes for ParallelMatcher (True for all cores); experimental
     _auto_run_start=False
     def _convert_info(self,objects,methods):
         self._productions=[]
         self._initializers=[]
         self._keys_used=Set()
         for k,v in list(methods.items()):
-            a,va,hk,d=inspect.getargspec(v)
+            a,va,hk,d=getargspec(v)
             if va is None and hk is None:
               if d is None and len(a)==0:
                 p=Production(self,k,v)
@@ -67,7 +216,7 @@ class ProductionSystem(model.Model):
                 p=Production(self,k,v)
                 self._keys_used.update(p.keys)
                 self._productions.append(p)
-        self.sch.add(self._process_productions)
+        self.sch.add(self._production_cycle(self))
     
     def _calc_context(self):
         context={}
@@ -101,25 +250,13 @@ class ProductionSystem(model.Model):
         context['top']=top
         self._top=top
         self._context=context
+        if self._profile is None and self._parallel_matching:
+            processes=None if self._parallel_matching is True else self._parallel_matching
+            self._matcher=ParallelMatcher(self._productions,context,processes)
+        elif self._profile is None:
+            self._matcher=Matcher(self._productions,context)
+        else:
+            self._matcher=ProfilingMatcher(self._productions,context,self._profile)
+        for p in self._initializers+self._productions:
+            p.bind(context)
     
-    def _process_productions(self):
-        self._calc_context()          
-        for i in self._initializers:
-            i.fire(self._context)
-        while True:
-          if self.production_match_delay>0: yield self.production_match_delay  
-          match=[p for p in self._productions if p.match(self._context)]
-          if len(match)==0:
-            yield self._top.changes
-          else:
-            choice=self.random.choice(match)
-            self.log.production=choice.name
-            yield self.production_time-self.production_match_delay
-            self.log.production=None
-            choice.fire(self._context)
-            
-        
-                          
-            
-            
-        
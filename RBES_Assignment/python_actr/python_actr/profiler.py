@@ -0,0 +1,136 @@
+import json
+import time
+
+from .matcher import Matcher
+
+
+class ProfilingMatcher(Matcher):
+    """A Matcher that tells a ProductionProfile what each match costs."""
+    def __init__(self,productions,context,profile):
+        Matcher.__init__(self,productions,context)
+        self.profile=profile
+
+    def match(self):
+        evaluations=self.evaluations
+        result=Matcher.match(self)
+        self.profile.cycle(self.evaluations-evaluations,len(self.productions))
+        return result
+
+    def matches(self,p):
+        start=time.perf_counter()
+        m=Matcher.matches(self,p)
+        self.profile.matched(p,m,time.perf_counter()-start)
+        return m
+
+
+class ProductionProfile:
+    """What matching and firing the productions of a system has cost.
+
+    For each production it keeps the number of times it was matched and
+    how long that took, how often it matched, and the number of times it
+    fired and how long that took.  It also counts the match cycles (each
+    one follows a change to the model or a firing), those in which any
+    production had to be matched again, and those in which all of them
+    did.
+    """
+    columns=['production','attempts','matches','success','match_time','fires','fire_time']
+
+    def __init__(self,system,filename=None,sort='match_time'):
+        self.system=system
+        self.filename=filename
+        self.sort=sort
+        self.stats={}
+        self.cycles=0
+        self.rematches=0
+        self.full_rematches=0
+
+    def _stats(self,p):
+        s=self.stats.get(p.name)
+        if s is None:
+            s=self.stats[p.name]=dict(attempts=0,matches=0,match_time=0.0,fires=0,fire_time=0.0)
+        return s
+
+    def cycle(self,evaluated,productions):
+        self.cycles+=1
+        if evaluated>0: self.rematches+=1
+        if evaluated>=productions>0: self.full_rematches+=1
+
+    def matched(self,p,m,elapsed):
+        s=self._stats(p)
+        s['attempts']+=1
+        if m: s['matches']+=1
+        s['match_time']+=elapsed
+
+    def fire(self,p,context):
+        start=time.perf_counter()
+        try:
+            p.fire(context)
+        finally:
+            s=self._stats(p)
+            s['fires']+=1
+            s['fire_time']+=time.perf_counter()-start
+
+    def rows(self):
+        rows=[]
+        for name,s in self.stats.items():
+            row=dict(s,production=name)
+            row['success']=s['matches']/s['attempts'] if s['attempts'] else 0.0
+            rows.append(row)
+        rows.sort(key=lambda r:r[self.sort],reverse=self.sort!='production')
+        return rows
+
+    def summary(self):
+        return dict(system=self.system.name,cycles=self.cycles,rematches=self.rematches,
+                    full_rematches=self.full_rematches,productions=self.rows())
+
+    def table(self):
+        lines=['production profile for %s: %d match cycles, %d re-matched, %d in full'%(
+               self.system.name,self.cycles,self.rematches,self.full_rematches),
+               '%-30s %9s %9s %7s %11s %9s %11s'%tuple(self.columns)]
+        for r in self.rows():
+            lines.append('%-30s %9d %9d %7.3f %11.6f %9d %11.6f'%tuple(r[c] for c in self.columns))
+        return '\n'.join(lines)
+
+    def report(self):
+        print(self.table())
+        if self.filename is not None:
+            with open(self.filename,'w') as f:
+                json.dump(self.summary(),f,indent=1)
+
+
+profiles=[]
+
+def profile_productions(model,filename=None,sort='match_time'):
+    """Records what matching and firing costs for the productions of model.
+
+    Every production system in model (including model itself) is profiled,
+    and logger.finished() prints a table of the productions sorted by sort
+    (one of ProductionProfile.columns) for each of them.  If filename is
+    given, the same is written there as JSON.  Returns the profiles.
+    """
+    from .production import ProductionSystem
+    model._ensure_converted()
+    found=[]
+    def visit(m):
+        if isinstance(m,ProductionSystem): found.append(m)
+        for child in m.get_children():
+            if child.parent is m: visit(child)
+    visit(model)
+    result=[]
+    for i,system in enumerate(found):
+        name=filename
+        if name is not None and len(found)>1:
+            base,dot,ext=filename.rpartition('.')
+            name='%s-%s.%s'%(base,system.name,ext) if dot else '%s-%s'%(filename,system.name)
+        profile=ProductionProfile(system,name,sort)
+        system._profile=profile
+        if hasattr(system,'_matcher'):
+            system._matcher=ProfilingMatcher(system._productions,system._context,profile)
+        profiles.append(profile)
+        result.append(profile)
+    return result
+
+def finished():
+    for profile in profiles:
+        profile.report()
+    del profiles[:]
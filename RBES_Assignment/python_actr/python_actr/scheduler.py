@@ -4,6 +4,9 @@ try:
 except ImportError:
     import ccm.legacy.heapq as heapq
 import copy
+import itertools
+import collections
+import types
 
 from . import logger
 
@@ -13,10 +16,24 @@ class Trigger:
     def __str__(self):
         return '<Trigger "%s">'%self.name    
 
+class Process:
+    """A resumable alternative to a generator.
+
+    step() is called each time the process runs and returns whatever a
+    generator would yield, or None when it is finished.  All of its state
+    lives in attributes, so unlike a generator it can be copied along with
+    the rest of a model (see Model.snapshot).
+    """
+    def step(self):
+        return None
+    def __call__(self):
+        return self.step()
+
 class Event:
-  generator=False
+  __slots__=('name','func','args','keys','time','priority','group','cancelled','parent','generator','queued','waiting')
   def __init__(self,func,time,args=[],keys={},priority=0):    
     self.name=getattr(func,'func_name',None)
+    self.generator=False
 
     try:
        code=func.__code__
@@ -30,6 +47,8 @@ class Event:
         args=[]
         keys={}
         self.generator=True
+    elif isinstance(func,Process):
+        self.generator=True
 
     self.func=func
     self.args=args
@@ -39,28 +58,27 @@ class Event:
     self.group=()
     self.cancelled=False
     self.parent=None
-  #def __cmp__(self,other):
-    #return cmp((self.time,-self.priority),(other.time,-other.priority))
+    self.queued=False
+    self.waiting=None
+
+  def __copy__(self):
+    e=Event.__new__(Event)
+    e.name=self.name
+    e.func=self.func
+    e.args=self.args
+    e.keys=self.keys
+    e.time=self.time
+    e.priority=self.priority
+    e.group=self.group
+    e.cancelled=self.cancelled
+    e.parent=self.parent
+    e.generator=self.generator
+    e.queued=False
+    e.waiting=None
+    return e
   
   def __lt__(self,other):
-    #print(self.time,-self.priority,'other',other.time,-other.priority)
     return (self.time,-self.priority) < (other.time,-other.priority)
-    #return cmp((self.time,-self.priority),(other.time,-other.priority))
-
-  def __le__(self, other):
-    return cmp((self.time,-self.priority),(other.time,-other.priority))
-
-  def __eq__(self,other):
-    return cmp((self.time,-self.priority),(other.time,-other.priority))
-
-  def __ge__(self, other):
-    return cmp((self.time,-self.priority),(other.time,-other.priority))
-  
-  def __gt__(self,other):
-    return cmp((self.time,-self.priority),(other.time,-other.priority))
-
-  def __ne__(self, other):
-    return cmp((self.time,-self.priority),(other.time,-other.priority))  
 
   def __repr__(self):
     return '<%s %x %5.3f>'%(self.name,id(self.func),self.time)
@@ -68,36 +86,145 @@ class Event:
 class SchedulerError(Exception):
     pass
 
-class Scheduler:
+class HeapQueue:
+    """Binary heap of (time,-priority,seq,event) entries."""
+    def __init__(self):
+        self.heap=[]
+        self._seq=itertools.count()
+    def push(self,event):
+        heapq.heappush(self.heap,(event.time,-event.priority,next(self._seq),event))
+    def push_many(self,events):
+        heap=self.heap
+        if len(events)*len(heap).bit_length()>len(heap):
+            seq=self._seq
+            heap.extend([(e.time,-e.priority,next(seq),e) for e in events])
+            heapq.heapify(heap)
+        else:
+            for e in events: self.push(e)
+    def pop(self):
+        return heapq.heappop(self.heap)[3]
+    def next_time(self):
+        return self.heap[0][0]
+    def events(self):
+        return [entry[3] for entry in sorted(self.heap)]
+    def compact(self):
+        self.heap=[entry for entry in self.heap if not entry[3].cancelled]
+        heapq.heapify(self.heap)
+    def __len__(self):
+        return len(self.heap)
+    def __deepcopy__(self,memo):
+        q=HeapQueue.__new__(HeapQueue)
+        memo[id(self)]=q
+        q.heap=copy.deepcopy(self.heap,memo)
+        q._seq=itertools.count(next(self._seq))
+        return q
+
+class CalendarQueue:
+    """Events bucketed by (time,-priority).
+
+    Each bucket is a FIFO, so events due at the same instant with the same
+    priority are pushed and popped in O(1).  Only the first event in a new
+    bucket pays for a heap operation on the (much smaller) set of distinct
+    keys.  Ordering is identical to HeapQueue.
+    """
     def __init__(self):
-        self.queue=[]
+        self.keys=[]
+        self.buckets={}
+        self.count=0
+    def push(self,event):
+        key=(event.time,-event.priority)
+        bucket=self.buckets.get(key)
+        if bucket is None:
+            self.buckets[key]=bucket=collections.deque()
+            heapq.heappush(self.keys,key)
+        bucket.append(event)
+        self.count+=1
+    def push_many(self,events):
+        for e in events: self.push(e)
+    def pop(self):
+        key=self.keys[0]
+        bucket=self.buckets[key]
+        event=bucket.popleft()
+        if not bucket:
+            del self.buckets[key]
+            heapq.heappop(self.keys)
+        self.count-=1
+        return event
+    def next_time(self):
+        return self.keys[0][0]
+    def events(self):
+        return [e for key in sorted(self.keys) for e in self.buckets[key]]
+    def compact(self):
+        for key,bucket in list(self.buckets.items()):
+            live=collections.deque(e for e in bucket if not e.cancelled)
+            if live: self.buckets[key]=live
+            else: del self.buckets[key]
+        self.keys=list(self.buckets.keys())
+        heapq.heapify(self.keys)
+        self.count=sum(len(b) for b in self.buckets.values())
+    def __len__(self):
+        return self.count
+
+queues={'heap':HeapQueue,'calendar':CalendarQueue}
+
+class Scheduler:
+    compact_ratio=0.5       # compact once this fraction of the queue is cancelled
+    compact_minimum=256     # ...and at least this many cancelled events are queued
+    def __init__(self,queue='heap'):
+        if isinstance(queue,str):
+            try:
+                queue=queues[queue]
+            except KeyError:
+                raise SchedulerError("Unknown queue type '%s'"%queue)
+        self.queue=queue()
         self.to_be_added=[]
         self.triggers={}
         self.time=0.0
         self.stop_flag=False
         self.log=logger.log_proxy
+        self.dead=0             # cancelled events still in the queue
+        self.compactions=0
     def extend(self,other):
         for k,v in list(other.triggers.items()):    
             if k not in self.triggers:
                 self.triggers[k]=v
             else:
-                self.triggers[k].extend(v)
-        if len(other.queue)>0:
-            self.queue.extend(other.queue)
-            heapq.heapify(self.queue)            
+                self.triggers[k].update(v)
+        for event in other.queue.events():
+            event.queued=False
+            self.add_event(event)
     def trigger(self,key,priority=None):
-        if 'OpenGL' in key.name:
-          print(key.name)
-          print(key in self.triggers)
-        if key in self.triggers:
-            for event in self.triggers[key]:
-                event.time=self.time
-                if priority is not None:
-                   event.priority=priority
-                self.add_event(event)
-            del self.triggers[key][:]
+        waiters=self.triggers.pop(key,None)
+        if waiters is None: return
+        time=self.time
+        for event in waiters:
+            event.time=time
+            event.waiting=None
+            event.queued=True
+            if priority is not None:
+               event.priority=priority
+        self.queue.push_many(list(waiters))
+    def subscribe(self,key,event):
+        event.time=None
+        event.waiting=key
+        waiters=self.triggers.get(key)
+        if waiters is None:
+            self.triggers[key]={event:None}
+        else:
+            waiters[event]=None
+    def unsubscribe(self,event):
+        key=event.waiting
+        if key is None: return
+        event.waiting=None
+        waiters=self.triggers[key]
+        del waiters[event]
+        if len(waiters)==0: del self.triggers[key]
+    def has_waiters(self,key):
+        return key in self.triggers
     def add_event(self,event):
-        heapq.heappush(self.queue,event)
+        if event.cancelled: return
+        event.queued=True
+        self.queue.push(event)
     def add(self,func,delay=0,args=[],keys={},priority=0,thread_safe=False):
         if thread_safe:
           self.to_be_added.append((func,delay,args,keys,priority))
@@ -108,12 +235,15 @@ class Scheduler:
         
     def run(self):
         self.stop_flag=False
-        while not self.stop_flag and len(self.queue)>0:
-            next=self.queue[0].time
+        queue=self.queue
+        while not self.stop_flag and len(queue)>0:
+            next=queue.next_time()
             if next>self.time:
                 self.time=next
                 self.log.time=next
-            self.do_event(heapq.heappop(self.queue))    
+            event=queue.pop()
+            event.queued=False
+            self.do_event(event)
             while self.to_be_added:
               self.add(*self.to_be_added.pop())
         
@@ -126,11 +256,7 @@ class Scheduler:
             event.priority=result.get('priority',event.priority)
             self.add_event(event)
         elif isinstance(result,(str,Trigger)):
-            event.time=None
-            if result not in self.triggers:
-                self.triggers[result]=[event]
-            else:
-                self.triggers[result].append(event)
+            self.subscribe(result,event)
         elif isinstance(result,(list,tuple)):
             events=[copy.copy(event) for r in result]
             for e in events: e.group=events
@@ -153,9 +279,11 @@ class Scheduler:
     def do_event(self,event):
         assert self.time==event.time
 
-        if event.cancelled: return
-        for e in event.group: e.cancelled=True
-        event.cancelled=False
+        if event.cancelled:
+            self.dead-=1
+            return
+        for e in event.group:
+            if e is not event: self.cancel(e)
 
         try:
           result=event.func(*event.args,**event.keys)
@@ -170,5 +298,43 @@ class Scheduler:
           
         
     
+    def cancel(self,event):
+        if event.cancelled: return
+        event.cancelled=True
+        if event.queued:
+            self.dead+=1
+            if self.dead>=self.compact_minimum and self.dead>=self.compact_ratio*len(self.queue):
+                self.compact()
+        elif event.waiting is not None:
+            self.unsubscribe(event)
+
+    def compact(self):
+        self.queue.compact()
+        self.dead=0
+        self.compactions+=1
+
+    def generator_events(self):
+        # events driven by a generator, which cannot be copied
+        found=[]
+        events=self.queue.events()
+        for waiters in self.triggers.values(): events.extend(waiters)
+        seen=set()
+        while events:
+            e=events.pop()
+            if id(e) in seen: continue
+            seen.add(id(e))
+            if e.cancelled: continue
+            if isinstance(getattr(e.func,'__self__',None),types.GeneratorType):
+                found.append(e)
+            if e.parent is not None: events.append(e.parent)
+        return found
+
+    def queue_size(self):
+        return len(self.queue)
+
+    def dead_ratio(self):
+        if len(self.queue)==0: return 0.0
+        return self.dead/len(self.queue)
+    
     def stop(self):    
       self.stop_flag=True  
@@ -47,6 +47,23 @@ class TestACTRProduction(unittest.TestCase):
         c=Chunk(dict(a=1,b=2))
         self.assertEqual(c['a'],1)
         self.assertEqual(c['b'],2)
+
+    def test_chunk_symbols(self):
+        import copy
+        from python_actr.actr.buffer import Chunk
+        from python_actr.pattern import Pattern
+        c=Chunk(dict(a=1,b=0.5))
+        self.assertEqual(c._symbols,dict(a='1',b='0.5'))
+        self.assertTrue(Pattern('a:1 b:0.5').match(c) is not None)
+        c['a']=2
+        del c['b']
+        self.assertEqual(c['a'],2)
+        self.assertEqual(c._symbols,dict(a='2'))
+        d=copy.copy(c)
+        d['a']=3
+        self.assertEqual(c._symbols,dict(a='2'))
+        self.assertTrue(Pattern('a:3').match(d) is not None)
+        self.assertTrue(Pattern('a:3').match(c) is None)
       
     
     
@@ -41,6 +41,25 @@ class TwoWords(ACTR):
         self.stop()
         
 
+class Batched(ACTR):
+    _random_seed=1
+    goal=Buffer()
+    retrieval=Buffer()
+    memory=Memory(retrieval)
+    DMNoise(memory,noise=0.3,baseNoise=0.1)
+    DMBaseLevel(memory)
+    DMFixed(memory,default=0.25)
+    DMSpreading(memory,goal)
+    DMInhibition(memory)
+    DMAssociate(memory,goal)
+
+    def init():
+        for i in range(12):
+            memory.add('item%d colour:c%d'%(i,i%3),time=i*0.1,fixed=i*0.01)
+        memory.add('item1 colour:c1')
+        goal.set('colour:c1 item2')
+
+
 class TestACTRMemory(unittest.TestCase):
     def test_basic(self):
         p=Basic()
@@ -75,6 +94,148 @@ class TestACTRMemory(unittest.TestCase):
         p.run()
         self.assertEqual(p.focal.chunk[0],'A')
 
+    def test_partial_scores(self):
+        from python_actr.actr.dm import Partial as P
+        class Exact(P):
+            def match(self,key,a,b):
+                return P.match(self,key,a,b)
+        memory=Memory(Buffer())
+        for i in range(30):
+            memory.add('item%d position:%s colour:%s size:%d'%(i,['first','second','third','fourth'][i%4],['red','blue'][i%3==0],i%5))
+        partial=P(memory,strength=0.5,limit=-2)
+        partial.similarity('first','second',-0.25)
+        partial.similarity('second','third',-0.5)
+        partial.similarity('red','blue',-0.75)
+        exact=Exact(memory,strength=0.5,limit=-2)
+        exact.sims=partial.sims
+        for text in ['position:first colour:red','position:second size:!3','? position:third colour:?c','size:4 colour:blue']:
+            matches,scores=partial.matcher().matches(text,None,memory.dm)
+            pattern=python_actr.pattern.Pattern(text,None,partial=exact)
+            expected=[x for x in memory.dm if pattern.match(x) is not None]
+            self.assertEqual(matches,expected)
+            self.assertEqual(scores,[x._partial for x in expected])
+        self.assertIsNone(exact.matcher())
+        partial.similarity('first','third',-0.125)
+        matches,scores=partial.matcher().matches('position:first',None,memory.dm)
+        self.assertIn(-0.0625,scores)
+
+    def test_index(self):
+        memory=Memory(Buffer())
+        for i in range(200):
+            memory.add('item%d colour:%s size:%d'%(i%40,['red','blue','green'][i%3],i%40%7))
+        self.assertEqual(len(memory.dm),120)
+        for text in ['item3 colour:red','? colour:blue size:!2','item3 size:?s','item1 colour:red size:1','? colour:purple','?']:
+            pattern=python_actr.pattern.Pattern(text)
+            expected=[x for x in memory.dm if pattern.match(x) is not None]
+            self.assertEqual(memory._matching(text,None),expected)
+        memory.dm.append(python_actr.actr.buffer.Chunk('item1 colour:red size:1'))
+        self.assertEqual(len(memory._matching('item1 colour:red size:1',None)),2)
+        memory.dm[0]=python_actr.actr.buffer.Chunk('replaced colour:red')
+        self.assertEqual(memory._matching('replaced',None),[memory.dm[0]])
+        memory.clear()
+        self.assertEqual(memory._matching('item1',None),[])
+        memory.add({'flag':1,'size':2.0})
+        memory.add({'flag':True,'size':2})
+        self.assertEqual(len(memory.dm),1)
+
+    @unittest.skipIf(python_actr.actr.dm.numpy is None,'numpy is not installed')
+    def test_vectorized_baselevel(self):
+        import random
+        rng=random.Random(1)
+        for limit in None,0,3:
+            memory=Memory(Buffer())
+            base=DMBaseLevel(memory,decay=0.4,limit=limit)
+            now=[0.0]
+            base.now=lambda:now[0]
+            for i in range(300):
+                now[0]=i*0.1
+                memory.add('item%d'%rng.randrange(40),time=rng.random())
+            memory.add('fixed',baselevel=0.5)
+            now[0]=31.0
+            expected=[base.activation(c) for c in memory.dm]
+            activations=base.activation_many(memory.dm)
+            for a,b in zip(activations,expected):
+                self.assertAlmostEqual(a,b,places=12)
+            self.assertEqual(memory.get_activations(memory.dm),activations.tolist())
+
+    @unittest.skipIf(python_actr.actr.dm.numpy is None,'numpy is not installed')
+    def test_activation_many(self):
+        p=Batched()
+        p.run(limit=3)
+        memory=p.memory
+        state=p.random.getstate()
+        expected=[memory.get_activation(c) for c in memory.dm]
+        p.random.setstate(state)
+        activations=memory.get_activations(memory.dm)
+        self.assertEqual(len(activations),len(expected))
+        for a,b in zip(activations,expected):
+            self.assertAlmostEqual(a,b,places=12)
+        memory._numpy_noise=True
+        activations=memory.get_activations(memory.dm)
+        self.assertNotEqual(activations,expected)
+
+    @unittest.skipIf(python_actr.actr.dm.numpy is None,'numpy is not installed')
+    def test_activation_many_errors(self):
+        memory=Memory(Buffer())
+        base=DMBaseLevel(memory,limit=0)
+        inhibition=DMInhibition(memory)
+        now=[0.0]
+        base.now=inhibition.now=lambda:now[0]
+        for i in range(20):
+            now[0]=i*0.1
+            memory.add('item%d'%i)
+        memory.add('item19')
+        for a,error in (base,ZeroDivisionError),(inhibition,ValueError):
+            self.assertRaises(error,a.activation,memory.dm[-1])
+            self.assertRaises(error,a.activation_many,memory.dm)
+            for x,c in zip(a.activation_many(memory.dm[:-1]),memory.dm[:-1]):
+                self.assertAlmostEqual(x,a.activation(c),places=12)
+
+    def test_cached_baselevel(self):
+        import random
+        for error in 0.001,0.05:
+            rng=random.Random(2)
+            memory=Memory(Buffer())
+            base=DMBaseLevel(memory,decay=0.5,error=error)
+            exact=DMBaseLevel(None,decay=0.5)
+            now=[0.0]
+            base.now=exact.now=lambda:now[0]
+            worst=0
+            for i in range(2000):
+                now[0]+=rng.expovariate(5)
+                if rng.random()<0.5:
+                    memory.add('item%d'%rng.randrange(20),time=rng.random()*0.1)
+                elif memory.dm:
+                    chunk=rng.choice(memory.dm)
+                    worst=max(worst,abs(base.activation(chunk)-exact.activation(chunk)))
+            self.assertLessEqual(worst,error)
+            self.assertGreater(worst,0)
+
+    @unittest.skipIf(python_actr.actr.dm.numpy is None,'numpy is not installed')
+    def test_spreading_matrix(self):
+        goal=Buffer()
+        other=Buffer()
+        memory=Memory(Buffer())
+        spreading=DMSpreading(memory,goal,other)
+        spreading.weight[other]=0.5
+        for i in range(60):
+            memory.add('w%d w%d w%d'%(i%7,i%11,i%13))
+        def check():
+            expected=[spreading.activation(c) for c in memory.dm]
+            activations=spreading.activation_many(memory.dm)
+            for a,b in zip(activations,expected):
+                self.assertAlmostEqual(a,b,places=12)
+            return activations
+        goal.set('w1 w2 w1')
+        other.set('w3')
+        before=check()
+        memory.add('w1 w1 w2')
+        self.assertNotEqual(check()[1],before[1])
+        goal.set('w5 w6')
+        check()
+        goal.clear()
+        check()
+
 
 if __name__ == '__main__':
   unittest.main()     
@@ -1,8 +1,14 @@
 import unittest
+import random
 
 import python_actr
 from python_actr import *
 
+try:
+    import numpy
+except ImportError:
+    numpy=None
+
 
 class Basic(ACTR):
     def init():
@@ -24,6 +30,163 @@ class UtilLearn(ACTR):
         self.c2+=1
 
 
+class Counting(ACTR):
+    goal=Buffer()
+    def init():
+        goal.set('count:1')
+    def up(goal='count:1'):
+        goal.set('count:2')
+    def up2(goal='count:2'):
+        goal.set('count:3')
+
+
+class ManyRules(ACTR):
+    goal=Buffer()
+    other=Buffer()
+    def init():
+        goal.set('count:1')
+        other.set('idle')
+    def up(goal='count:1'):
+        goal.set('count:2')
+    def up2(goal='count:2'):
+        goal.set('count:3')
+    def up3(goal='count:3'):
+        goal.set('count:4')
+    def rule1(other='busy 1'):
+        pass
+    def rule2(other='busy 2'):
+        pass
+    def rule3(other='busy 3'):
+        pass
+    def rule4(other='busy 4'):
+        pass
+
+
+class Shared(ACTR):
+    goal=Buffer()
+    extra=Buffer()
+    def init():
+        goal.set('task a start')
+        self.fired=[]
+    def start(goal='task a start',extra=None):
+        self.fired.append('start')
+        goal.set('task a 1')
+        extra.set('x')
+    def step(goal='task a !start!2',extra='x'):
+        self.fired.append('step')
+        goal.set('task a 2')
+    def other(goal='task !b 2',extra='!y'):
+        self.fired.append('other')
+        goal.set('task b 2')
+        extra.clear()
+    def finish(goal='task b ?n',extra=None):
+        self.fired.append('finish')
+        self.stop()
+
+
+class ParallelShared(Shared):
+    _parallel_matching=2
+
+
+class Actions(ACTR):
+    goal=Buffer()
+    def init():
+        goal.set('start 3')
+    def direct(goal='start ?n'):
+        goal.set('middle ?n')
+        self.n=int(n)
+    def local(goal='middle ?n'):
+        m=int(n)+1
+        goal.set('end ?m')
+
+
+class Counted(ProceduralSubModule):
+    _cacheable=True
+    def __init__(self):
+        self.calls=0
+        self.bonus=0
+    def utility(self,prod):
+        self.calls+=1
+        return self.bonus
+    def reward(self,value):
+        self.bonus+=value
+        self.changed()
+
+
+class Repeat(ACTR):
+    x=1
+    count=0
+    rewarding=False
+    counted=Counted()
+    def p1(self='x:1'):
+        self.count+=1
+        if self.rewarding: self.success()
+        if self.count==5: self.stop()
+
+class RewardedRepeat(Repeat):
+    rewarding=True
+
+
+class SeededUtilLearn(UtilLearn):
+    _random_seed=1
+
+
+class NumpyUtilLearn(SeededUtilLearn):
+    _numpy_utilities=True
+
+
+class Choice(ACTR):
+    _random_seed=1
+    goal=Buffer()
+    noise=PMNoise(noise=0.5)
+    def init():
+        goal.set('choose')
+        self.a=0
+        self.b=0
+    def choose_a(goal='choose'):
+        self.a+=1
+    def choose_b(goal='choose'):
+        self.b+=1
+
+
+class NumpyChoice(Choice):
+    _numpy_utilities=True
+
+
+class Ref(python_actr.Model):
+    x=0
+    def start(self):
+        yield 1
+        self.x=1
+
+class Dotted(ACTR):
+    fired=None
+    def seen(self='fired:None ref.x:1'):
+        self.fired=self.now()
+
+class Flicker(python_actr.Model):
+    x=0
+    def start(self):
+        yield 1
+        self.x=1
+        yield 0.02
+        self.x=0
+        yield 1
+        self.x=1
+
+class FlickerEnv(python_actr.Model):
+    ref=Flicker()
+    agent=Dotted()
+    def start(self):
+        self.agent.ref=self.ref
+
+class DottedEnv(python_actr.Model):
+    ref=Ref()
+    agent=Dotted()
+    def start(self):
+        self.agent.ref=self.ref
+
+
 class UtilSetting(ACTR):
     x=0
     def p1(self='x:0',utility=0.3):
@@ -50,10 +213,149 @@ class TestACTRProduction(unittest.TestCase):
           self.assertTrue(p.c1 in [17,18,19])
   
     
+    def test_actions(self):
+        p=Actions()
+        p.run()
+        self.assertEqual(p.n,3)
+        self.assertEqual(str(p.goal.chunk),'end 4')
+        actions=dict((q.name,q.action) for q in p._productions)
+        # assigning m puts it in the bound variables, so 'local' uses exec
+        self.assertIsNotNone(actions['direct'])
+        self.assertIsNone(actions['local'])
+
+    def test_cached_utility(self):
+        p=Repeat()
+        p.run()
+        self.assertEqual(p.count,5)
+        self.assertEqual(p.counted.calls,1)
+        p=RewardedRepeat()
+        p.run()
+        self.assertEqual(p.counted.calls,5)
+        self.assertEqual(p.get_activation('p1'),5)
+
+    @unittest.skipIf(numpy is None,'numpy is not installed')
+    def test_numpy_utilities(self):
+        for Rule in PMPGC,PMPGCSuccessWeighted,PMPGCMixedWeighted,PMTD,PMNew:
+          results=[]
+          for Model in SeededUtilLearn,NumpyUtilLearn:
+            p=Model()
+            p.pm=Rule()
+            p.run(limit=1)
+            results.append((p.c1,p.c2,p.get_activation()))
+          self.assertEqual(results[0],results[1])
+
+    @unittest.skipIf(numpy is None,'numpy is not installed')
+    def test_numpy_noise(self):
+        for Model in Choice,NumpyChoice:
+            p=Model()
+            p.run(limit=100)
+            self.assertEqual(p.a+p.b,2000)
+            self.assertTrue(900<p.a<1100)
+        noise=PMNoise()
+        noise.random=random.Random(1)
+        a=[noise.logisticNoise(0.5) for i in range(20000)]
+        b=noise.logisticNoises(0.5,20000)
+        # the logistic distribution with s=0.5 has a variance of pi**2/12
+        for x in a,b:
+            self.assertAlmostEqual(numpy.mean(x),0,delta=0.03)
+            self.assertAlmostEqual(numpy.var(x),numpy.pi**2/12,delta=0.05)
+
     def test_setting_utility(self):
         p=UtilSetting()
         p.run()
         self.assertEqual(p.x,2)
+
+    def test_incremental_matching(self):
+        p=ManyRules()
+        p.run()
+        self.assertEqual(p.goal.chunk['count'],'4')
+        self.assertEqual(len(p._productions),7)
+        # the rules testing 'other' are only matched once, and after that
+        # only the rule needing the new count (and the one that just fired)
+        self.assertEqual(p._matcher.evaluations,7+2+2+1)
+        # 'busy' in slot 0 of 'other' is tested once for all four rules
+        self.assertEqual(p._matcher.deduplicated,3)
+
+    def test_dotted_slot(self):
+        # ref is not part of the agent, so its changes don't change the
+        # agent's _version
+        env=DottedEnv()
+        env.run(limit=3)
+        self.assertAlmostEqual(env.agent.fired,1.05)
+
+    def test_changed_before_firing(self):
+        # ref.x goes back to 0 while seen waits to fire at 1.05
+        env=FlickerEnv()
+        env.run(limit=3)
+        self.assertAlmostEqual(env.agent.fired,2.07)
+
+    def test_shared_tests(self):
+        p=Shared()
+        p.run()
+        self.assertEqual(p.fired,['start','step','other','finish'])
+
+    def test_parallel_matching(self):
+        threshold=python_actr.matcher.ParallelMatcher.threshold
+        python_actr.matcher.ParallelMatcher.threshold=0
+        try:
+            p=ParallelShared()
+            p.run()
+        finally:
+            python_actr.matcher.ParallelMatcher.threshold=threshold
+        self.assertEqual(p.fired,['start','step','other','finish'])
+        self.assertGreater(p._matcher.parallel,0)
+        p._matcher.close()
+        python_actr.matcher.ParallelMatcher.threshold=0
+        try:
+            p=ParallelShared()
+            p.run(limit=0.06)
+            self.assertIsNotNone(p._matcher.pool)
+            q=p.snapshot().restore()
+            self.assertIsNone(q._matcher.pool)
+            q.run()
+            p._matcher.close()
+            q._matcher.close()
+        finally:
+            python_actr.matcher.ParallelMatcher.threshold=threshold
+        self.assertEqual(q.fired,['start','step','other','finish'])
+        p=ParallelShared()
+        p.run()
+        self.assertEqual(p.fired,['start','step','other','finish'])
+        self.assertEqual(p._matcher.parallel,0)
+
+    def test_class_changes(self):
+        class Rated(python_actr.Model):
+            rate=1
+            items=[1]
+        a=Rated()
+        a.run()
+        Rated.rate=2
+        Rated.items=[2]
+        b=Rated()
+        b.run()
+        self.assertEqual((a.rate,a.items),(1,[1]))
+        self.assertEqual((b.rate,b.items),(2,[2]))
+        class Timed(Counting):
+            pass
+        a=Timed()
+        a.run()
+        Timed.production_time=0.2
+        b=Timed()
+        b.run()
+        self.assertAlmostEqual(b.now(),a.now()*4)
+
+    def test_instances(self):
+        a=Counting()
+        b=Counting()
+        a.run()
+        self.assertEqual(a.goal.chunk['count'],'3')
+        self.assertEqual(b.goal.chunk,None)
+        b.run()
+        self.assertEqual(b.goal.chunk['count'],'3')
+        self.assertIsNot(a.goal,b.goal)
+        self.assertIsNot(a._productions[0],b._productions[0])
+        self.assertIs(a._productions[0].pattern,b._productions[0].pattern)
+        self.assertEqual(a._productions[0].keys,b._productions[0].keys)
     
     
     
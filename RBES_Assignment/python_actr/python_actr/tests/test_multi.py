@@ -0,0 +1,41 @@
+import unittest
+
+import python_actr
+
+
+class Walker(python_actr.Model):
+  def start(self):
+    self.position=0
+    self.steps=0
+    while True:
+      yield self.random.random()
+      self.position+=self.random.choice([-1,1])
+      self.steps+=1
+
+def started_walker():
+  m=Walker()
+  m.run(limit=1)
+  return m
+
+def final_state(model):
+  return (model.position,model.steps)
+
+
+class TestReplications(unittest.TestCase):
+  def test_replications(self):
+    expected=[]
+    for i in range(3):
+      m=Walker()
+      m._random_seed=python_actr.multi.seed_for('fit',i)
+      m.run(limit=10)
+      expected.append(final_state(m))
+    self.assertEqual(len(set(expected)),3)
+    results=python_actr.run_replications(Walker,3,limit=10,seed='fit',collect=final_state,processes=2)
+    self.assertEqual(results,expected)
+
+  def test_seed_converted(self):
+    self.assertRaises(ValueError,python_actr.multi._run_replication,started_walker,'x',1,None)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -78,4 +78,22 @@ def test_lambda():
     assert makePattern(lambda x,b: x.a+x.b+x.c==4).match(obj) == {}
     assert makePattern(lambda x,b: x.a+x.b+x.c==3).match(obj) == None      
     assert makePattern(['a:?z',lambda x,b: x.a+x.b+x.c-int(b['z'])==3]).match(obj) == {'z':'1'}
-    assert makePattern(['a:?z',lambda x,b: x.a+x.b+x.c+int(b['z'])==3]).match(obj) == None
\ No newline at end of file
+    assert makePattern(['a:?z',lambda x,b: x.a+x.b+x.c+int(b['z'])==3]).match(obj) == None
+def test_compiled():
+    def interpreted(p):
+        p.compiled=None
+        p._tests=None
+        return p
+    def compiled(p):
+        p.compile()
+        return p
+    objs=[{'self':Obj(a=1,b=2,c=1)},{'self':[1,2,1]},{'self':dict(a=True,b=False,c=None)},
+          {'self':dict(a=1.0,b='x',c=2.5)},{'self':None},{'a':dict(a=1,b=None),'c':dict(d=2,e=1)}]
+    patterns=['a:1 b:2 c:3','a:!2 b:2','a:?x c:?x','a:?x b:!?x','?x ? ?x','?x !?x','?x 2:?x',
+              'a:True b:False','c:None','a:1 b:x c:2.5',None,
+              ['a:?z',lambda x,b: b['z']=='1']]
+    for obj in objs:
+        for p in patterns:
+            assert compiled(makePattern(p)).match(obj) == interpreted(makePattern(p)).match(obj)
+        p=dict(a='a:?x',c='d:2 e:?x')
+        assert compiled(Pattern(p)).match(obj) == interpreted(Pattern(p)).match(obj)
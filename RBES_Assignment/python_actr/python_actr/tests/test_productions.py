@@ -42,5 +42,30 @@ def test_multi():
     
 
 
+def test_method_triggers():
+    class Module(python_actr.Model):
+      def work(self):
+          self.done=True
+      @python_actr.unwrapped
+      def peek(self):
+          return 1
+    class Env(python_actr.Model):
+      module=Module()
+      def start(self):
+          yield self.module.work
+          self.seen=self.now()
+      def poke(self):
+          yield 1
+          self.module.work()
+    e=Env()
+    e.run(limit=0)
+    assert isinstance(e.module.work,python_actr.model.MethodWrapper)
+    assert not isinstance(e.module.peek,python_actr.model.MethodWrapper)
+    assert e.module.peek()==1
+    e.poke()
+    e.run()
+    assert e.seen==1
+
+
 if __name__ == '__main__':
   unittest.main()     
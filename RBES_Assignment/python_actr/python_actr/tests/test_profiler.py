@@ -0,0 +1,57 @@
+import unittest
+import os
+import json
+import tempfile
+
+import python_actr
+from python_actr import *
+
+
+class Counting(ACTR):
+    goal=Buffer()
+    other=Buffer()
+    def init():
+        goal.set('count:1')
+        other.set('idle')
+    def up(goal='count:1'):
+        goal.set('count:2')
+    def up2(goal='count:2'):
+        goal.set('count:3')
+    def busy(other='busy'):
+        pass
+
+
+class TestProfiler(unittest.TestCase):
+    def test_profile(self):
+        filename=os.path.join(tempfile.mkdtemp(),'profile.json')
+        p=Counting()
+        profile,=profile_productions(p,filename,sort='production')
+        p.run()
+        stats=profile.stats
+        self.assertEqual(stats['up']['fires'],1)
+        self.assertEqual(stats['up2']['fires'],1)
+        self.assertNotIn('busy',[r['production'] for r in profile.rows() if r['fires']])
+        # 'busy' tests a buffer that never changes, so it is matched once
+        self.assertEqual(stats['busy']['attempts'],1)
+        self.assertEqual(stats['busy']['matches'],0)
+        self.assertEqual(stats['up']['matches'],1)
+        self.assertEqual(profile.full_rematches,1)
+        self.assertTrue(profile.cycles>=3)
+
+        python_actr.profiler.finished()
+        self.assertEqual(python_actr.profiler.profiles,[])
+        with open(filename) as f:
+            data=json.load(f)
+        self.assertEqual([r['production'] for r in data['productions']],['busy','up','up2'])
+        self.assertEqual(data['cycles'],profile.cycles)
+        self.assertIn('up2',profile.table())
+
+    def test_disabled(self):
+        p=Counting()
+        p.run()
+        self.assertIsNone(p._profile)
+        self.assertIs(type(p._matcher),python_actr.matcher.Matcher)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+import copy
+
+from python_actr import scheduler
+
+
+class TestScheduler(unittest.TestCase):
+    queue='heap'
+
+    def test_order(self):
+        sch=scheduler.Scheduler(self.queue)
+        order=[]
+        sch.add(order.append,delay=1,args=['late'])
+        sch.add(order.append,delay=0,args=['low'],priority=-1)
+        sch.add(order.append,delay=0,args=['high'],priority=1)
+        sch.add(order.append,delay=0,args=['first'])
+        sch.add(order.append,delay=0,args=['second'])
+        sch.run()
+        self.assertEqual(order,['high','first','second','low','late'])
+        self.assertEqual(sch.time,1)
+
+    def test_generator(self):
+        sch=scheduler.Scheduler(self.queue)
+        times=[]
+        def proc():
+            for d in [0.05,0.085,0.25]:
+                yield d
+                times.append(sch.time)
+        sch.add(proc)
+        sch.run()
+        self.assertEqual(len(times),3)
+        self.assertAlmostEqual(times[-1],0.385)
+
+    def test_group(self):
+        sch=scheduler.Scheduler(self.queue)
+        trigger=scheduler.Trigger('wake')
+        result=[]
+        def waiter():
+            yield [1.0,trigger]
+            result.append(sch.time)
+        sch.add(waiter)
+        sch.add(sch.trigger,delay=0.5,args=[trigger])
+        sch.run()
+        self.assertEqual(result,[0.5])
+
+    def test_event_copy(self):
+        e=scheduler.Event(len,0.5,args=['abc'],priority=3)
+        c=copy.copy(e)
+        self.assertIsNot(c,e)
+        self.assertEqual((c.time,c.priority,c.args),(0.5,3,['abc']))
+        self.assertFalse(hasattr(e,'__dict__'))
+
+    def test_extend(self):
+        sch=scheduler.Scheduler(self.queue)
+        other=scheduler.Scheduler(self.queue)
+        order=[]
+        other.add(order.append,delay=0.2,args=['b'])
+        other.add(order.append,delay=0.1,args=['a'])
+        sch.add(order.append,delay=0.1,args=['c'],priority=1)
+        sch.extend(other)
+        sch.run()
+        self.assertEqual(order,['c','a','b'])
+
+    def test_subscribe(self):
+        sch=scheduler.Scheduler(self.queue)
+        trigger=scheduler.Trigger('wake')
+        order=[]
+        a=scheduler.Event(order.append,0,args=['a'])
+        b=scheduler.Event(order.append,0,args=['b'])
+        sch.subscribe(trigger,a)
+        sch.subscribe(trigger,b)
+        sch.subscribe(trigger,a)
+        self.assertEqual(len(sch.triggers[trigger]),2)
+        sch.unsubscribe(b)
+        self.assertTrue(sch.has_waiters(trigger))
+        sch.trigger(trigger)
+        self.assertFalse(sch.has_waiters(trigger))
+        sch.run()
+        self.assertEqual(order,['a'])
+
+    def test_cancel_waiting(self):
+        sch=scheduler.Scheduler(self.queue)
+        trigger=scheduler.Trigger('wake')
+        e=scheduler.Event(len,0,args=['a'])
+        sch.subscribe(trigger,e)
+        sch.cancel(e)
+        self.assertFalse(sch.has_waiters(trigger))
+
+    def test_cancel(self):
+        sch=scheduler.Scheduler(self.queue)
+        order=[]
+        e=sch.add(order.append,delay=0.1,args=['a'])
+        sch.add(order.append,delay=0.2,args=['b'])
+        sch.cancel(e)
+        self.assertEqual(sch.dead,1)
+        self.assertEqual(sch.dead_ratio(),0.5)
+        sch.run()
+        self.assertEqual(order,['b'])
+        self.assertEqual(sch.dead,0)
+
+    def test_compaction(self):
+        sch=scheduler.Scheduler(self.queue)
+        sch.compact_minimum=10
+        trigger=scheduler.Trigger('never')
+        fired=[]
+        def waiter(i):
+            yield [trigger,0.01*(i+1)]
+            fired.append(i)
+        for i in range(100):
+            sch.add(waiter,args=[i])
+        sch.run()
+        self.assertEqual(fired,list(range(100)))
+        self.assertEqual(sch.queue_size(),0)
+        self.assertEqual(sch.dead,0)
+        self.assertFalse(sch.has_waiters(trigger))
+
+        events=[sch.add(fired.append,delay=1,args=[i]) for i in range(40)]
+        for e in events[:30]: sch.cancel(e)
+        self.assertTrue(sch.compactions>0)
+        self.assertEqual(sch.queue_size(),10+sch.dead)
+        del fired[:]
+        sch.run()
+        self.assertEqual(fired,list(range(30,40)))
+
+    def test_unknown_queue(self):
+        self.assertRaises(scheduler.SchedulerError,scheduler.Scheduler,'missing')
+
+
+class TestCalendarScheduler(TestScheduler):
+    queue='calendar'
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+import python_actr
+from python_actr import *
+from python_actr.scheduler import SchedulerError
+
+
+class Counter(ACTR):
+    _random_seed=1
+    goal=Buffer()
+    retrieval=Buffer()
+    memory=Memory(retrieval,latency=0.1,threshold=-3)
+    DMNoise(memory,noise=0.3)
+    DMBaseLevel(memory)
+
+    def init():
+        for i in range(8):
+            memory.add('count %d %d'%(i,i+1))
+        goal.set('count 0 start')
+        self.history=[]
+
+    def request(goal='count ?a start',memory='busy:False'):
+        memory.request('count ?a ?')
+        goal.set('count ?a wait')
+
+    def recalled(goal='count ?a wait',retrieval='count ?a ?b'):
+        self.history.append((self.now(),b))
+        goal.set('count ?b start')
+        retrieval.clear()
+
+    def failed(goal='count ?a wait',memory='error:True'):
+        goal.set('done')
+        self.stop()
+
+
+class Ticker(python_actr.Model):
+    def start(self):
+        while True:
+            yield 1
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_branches(self):
+        model=Counter()
+        model.run(limit=0.3)
+        snapshot=model.snapshot()
+        a=snapshot.restore()
+        b=snapshot.restore()
+        self.assertIsNot(a,b)
+        self.assertEqual(a.now(),model.now())
+        for m in (model,a,b):
+            m.run(limit=2)
+        self.assertEqual(a.history,model.history)
+        self.assertEqual(b.history,model.history)
+        self.assertEqual(model.goal.chunk,a.goal.chunk)
+
+    def test_generator_process(self):
+        model=Ticker()
+        model.run(limit=2)
+        self.assertRaises(SchedulerError,model.snapshot)
+
+
+if __name__ == '__main__':
+    unittest.main()